@@ -2,16 +2,28 @@
 
 from __future__ import print_function
 
-from os import devnull
+from os import devnull, makedirs
+from os.path import isdir, join
+from importlib import import_module
 from subprocess import PIPE, CalledProcessError, Popen, check_output
+from threading import local
 
-from requests import Response
+# Module and class name of each service, only the configured service is
+# imported.
+SERVICES = {
+    'GitHub': ('git_issue.github', 'GitHub'),
+    'GitHubGraphQL': ('git_issue.github', 'GitHubGraphQL'),
+    'GitLab': ('git_issue.gitlab', 'GitLab'),
+    'Gogs': ('git_issue.gogs', 'Gogs'),
+}
 
 
 class GitIssueError(Exception):
     """Exception class for git_issue."""
     def __init__(self, message):
-        if isinstance(message, Response):
+        # Any object with a status_code is treated as a requests.Response,
+        # requests is not imported until a request is made.
+        if hasattr(message, 'status_code'):
             if message.status_code == 404:
                 self.message = 'issue not found'
             else:
@@ -20,45 +32,146 @@ class GitIssueError(Exception):
             self.message = message
 
 
+# Snapshot of the repository context, populated on first use and reused for
+# the lifetime of the process. Also holds the 'debug' flag set by --debug.
+CONTEXT = {}
+
+# Output settings of the command being run by the current thread, the daemon
+# sets 'tty' to render output as it would be rendered by the client.
+OUTPUT = local()
+
+
+def is_tty():
+    """Check if command output is written to a terminal.
+
+    Returns:
+        :bool: ``OUTPUT.tty`` when set, otherwise if ``stdout`` is a terminal.
+    """
+    tty = getattr(OUTPUT, 'tty', None)
+    if tty is None:
+        from sys import stdout
+        return stdout.isatty()
+    return tty
+
+
+def _normalize_key_(name):
+    # Section and key names are case insensitive, subsection names are not.
+    parts = name.split('.')
+    parts[0] = parts[0].lower()
+    parts[-1] = parts[-1].lower()
+    return '.'.join(parts)
+
+
+def _config_():
+    """Get a snapshot of all git config options.
+
+    All options are read using a single ``git config --list -z`` invocation,
+    when an option is set multiple times the last value wins which matches the
+    behaviour of ``git config --get``.
+
+    Returns:
+        :dict: Mapping of normalized option names to values.
+    """
+    if 'config' not in CONTEXT:
+        config = {}
+        with open(devnull, 'w+b') as DEVNULL:
+            try:
+                output = check_output(['git', 'config', '--list', '-z'],
+                                      stderr=DEVNULL).decode()
+            except CalledProcessError:
+                output = ''
+        for entry in output.split('\0'):
+            if entry:
+                key, _, value = entry.partition('\n')
+                config[_normalize_key_(key)] = value
+        CONTEXT['config'] = config
+        CONTEXT['commands'] = {}
+    return CONTEXT['config']
+
+
 def get_config(name):
     """Get the value of a git config option.
 
     Arguments:
         :name: Name of the option to get.
+
+    Raises:
+        :CalledProcessError: If the option is not set, for consistency with
+        ``git config --get``.
     """
-    with open(devnull, 'w+b') as DEVNULL:
-        config = check_output(['git', 'config', '--get', name],
-                              stderr=DEVNULL).decode().strip()
-        if config.startswith('!'):
-            process = Popen(config[1:], shell=True, stdout=PIPE, stderr=PIPE)
+    key = _normalize_key_(name)
+    config = _config_()
+    if key not in config:
+        raise CalledProcessError(1, ['git', 'config', '--get', name])
+    value = config[key].strip()
+    if value.startswith('!'):
+        # Shell commands are only evaluated once, they may be expensive or
+        # interactive, e.g. decrypting a token with gpg.
+        commands = CONTEXT['commands']
+        if key not in commands:
+            process = Popen(value[1:], shell=True, stdout=PIPE, stderr=PIPE)
             stdout, stderr = process.communicate()
             if process.returncode != 0:
                 raise GitIssueError('%s = %s\n%s' %
-                                    (name, config, stderr.strip()))
-            config = stdout.decode().strip()
-        return config
+                                    (name, value, stderr.strip()))
+            commands[key] = stdout.decode().strip()
+        value = commands[key]
+    return value
 
 
-def get_service():
-    """Get the configured service object.
+def get_git_dir():
+    """Get the path to the repositories git directory.
 
     Returns:
-        :Service: A subclass implementing the ``Service`` abstract base class.
+        :str: Path of the git directory.
+    """
+    if 'git_dir' not in CONTEXT:
+        CONTEXT['git_dir'] = check_output(
+            ['git', 'rev-parse', '--git-dir']).decode().strip()
+    return CONTEXT['git_dir']
+
+
+def get_cache_dir():
+    """Get the path to the directory used to store local data.
+
+    The directory is ``issue`` inside the repositories git directory and is
+    created if it does not already exist.
+
+    Returns:
+        :str: Path of the cache directory.
+    """
+    path = join(get_git_dir(), 'issue')
+    if not isdir(path):
+        makedirs(path)
+    return path
+
+
+def get_service_name():
+    """Get the name of the configured service.
+
+    Returns:
+        :str: Value of ``issue.service``.
+
+    Raises:
+        :GitIssueError: If ``issue.service`` is not set.
     """
     try:
-        name = get_config('issue.service')
-        try:
-            # NOTE: Import and add new services here.
-            from git_issue.github import GitHub
-            from git_issue.gitlab import GitLab
-            from git_issue.gogs import Gogs
-            return {
-                'GitHub': GitHub,
-                'GitLab': GitLab,
-                'Gogs': Gogs,
-            }[name]()
-        except KeyError:
-            raise GitIssueError('invalid issue service: %s' % name)
+        return get_config('issue.service')
     except CalledProcessError:
         raise GitIssueError('issue service not set, specify using:\n'
                             'git config issue.service <service>')
+
+
+def get_service():
+    """Get the configured service object.
+
+    Returns:
+        :Service: A subclass implementing the ``Service`` abstract base class.
+    """
+    name = get_service_name()
+    try:
+        # NOTE: Add new services to SERVICES.
+        module, service = SERVICES[name]
+    except KeyError:
+        raise GitIssueError('invalid issue service: %s' % name)
+    return getattr(import_module(module), service)()
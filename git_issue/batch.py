@@ -0,0 +1,212 @@
+"""Batch import and export of issues."""
+
+from __future__ import print_function
+
+import csv
+from collections import defaultdict
+from hashlib import sha1
+from io import open
+from json import dumps, loads
+from os import makedirs, remove
+from os.path import exists, isdir, join
+from threading import Lock
+
+from git_issue import GitIssueError, get_cache_dir
+from git_issue.service import IssueComment, basestring
+
+# Columns of an imported row, labels are a list in JSONL and comma separated
+# in CSV.
+COLUMNS = ['title', 'body', 'assignee', 'labels', 'milestone']
+
+
+def _format_(path, format):
+    if format:
+        return format
+    if path.endswith('.csv'):
+        return 'csv'
+    if path.endswith('.jsonl') or path.endswith('.json'):
+        return 'jsonl'
+    raise GitIssueError('unknown format of %s, specify using --format' % path)
+
+
+def _row_(row):
+    if not isinstance(row, dict):
+        raise GitIssueError('expected an object with a "title"')
+    if not row.get('title'):
+        raise GitIssueError('missing "title"')
+    if None in row:
+        # csv.DictReader stores fields beyond those of the header under None.
+        raise GitIssueError('more fields than columns: %s' %
+                            ', '.join(['%s' % field for field in row[None]]))
+    unknown = ['%s' % column for column in row if column not in COLUMNS]
+    if unknown:
+        raise GitIssueError('unknown column: %s' % ', '.join(unknown))
+    for column in ['title', 'body', 'assignee', 'milestone']:
+        if row.get(column) is not None and \
+                not isinstance(row[column], basestring):
+            raise GitIssueError('expected "%s" to be a string' % column)
+    labels = row.get('labels')
+    if labels is None:
+        labels = []
+    elif isinstance(labels, basestring):
+        labels = [label.strip() for label in labels.split(',')
+                  if label.strip()]
+    elif not isinstance(labels, list) or not all(
+            isinstance(label, basestring) for label in labels):
+        raise GitIssueError('expected "labels" to be a list of strings')
+    return {
+        'title': row['title'],
+        'body': row.get('body') or '',
+        'assignee': row.get('assignee') or None,
+        'labels': labels,
+        'milestone': row.get('milestone') or None,
+    }
+
+
+def read_rows(path, format=None):
+    """Read the issues to import from a file.
+
+    Rows are read one at a time so that files of any size can be imported.
+    JSONL files contain one object per line, CSV files have a header naming
+    the columns, in both the columns are those in ``COLUMNS``.
+
+    Arguments:
+        :path: Path of the file to read.
+
+    Keyword Arguments:
+        :format: ``'jsonl'`` or ``'csv'``, by default determined from the
+        file extension.
+
+    Yields:
+        ``(number, row)`` tuples of the 1-based row number and either a
+        ``dict`` with all of the ``COLUMNS`` or the ``GitIssueError``
+        describing why the row is invalid.
+
+    Raises:
+        :GitIssueError: If the file can not be read.
+    """
+    format = _format_(path, format)
+    try:
+        rows = open(path, 'r', encoding='utf-8', newline='')
+    except IOError as error:
+        raise GitIssueError('failed to read %s: %s' % (path, error.strerror))
+    with rows:
+        if format == 'csv':
+            lines = enumerate(csv.DictReader(rows), 1)
+        else:
+            lines = enumerate((line for line in rows if line.strip()), 1)
+        for number, row in lines:
+            try:
+                if format != 'csv':
+                    try:
+                        row = loads(row)
+                    except ValueError as error:
+                        raise GitIssueError('invalid JSON: %s' % error)
+                yield number, _row_(row)
+            except GitIssueError as error:
+                yield number, error
+
+
+def _username_(user):
+    return user.username if user else None
+
+
+def issue_record(issue, timeline):
+    """Get the exported record of an issue.
+
+    Users are recorded by username only, so exporting requires no requests
+    to resolve user details.
+
+    Arguments:
+        :issue: ``Issue`` to export.
+        :timeline: ``list`` of the issues comments and events as returned by
+        ``Issue.timeline()``.
+
+    Returns:
+        :dict: JSON encodable record of the issue and its timeline.
+    """
+    # Events and states contain color placeholders, remove them.
+    plain = defaultdict(str)
+    return {
+        'number': '%r' % issue.number,
+        'title': issue.title,
+        'body': issue.body,
+        'state': issue.state.name,
+        'author': _username_(issue.author),
+        'created': issue.created_at,
+        'updated': issue.updated,
+        'assignee': _username_(issue.assignee),
+        'labels': [label.name for label in issue.labels],
+        'milestones': [milestone.title
+                       for milestone in issue.milestones or []],
+        'url': issue.url(),
+        'timeline': [{
+            'type': 'comment',
+            'id': '%s' % item.id,
+            'author': _username_(item.author),
+            'created': item.created_at,
+            'body': item.body,
+        } if isinstance(item, IssueComment) else {
+            'type': 'event',
+            'event': item.event % plain,
+            'actor': _username_(item.actor),
+            'created': item.created_at,
+        } for item in timeline],
+    }
+
+
+class Checkpoint(object):
+    """Record of completed items of a batch operation.
+
+    Each completed item is appended to a file in the ``checkpoints``
+    directory of the cache directory as soon as it completes, so an
+    interrupted operation loses no progress and can resume by skipping the
+    items it has already completed.
+
+    Arguments:
+        :operation: Name of the operation, e.g. ``'import'``.
+        :key: Identifies the input of the operation, e.g. a file path.
+    """
+
+    def __init__(self, operation, key):
+        directory = join(get_cache_dir(), 'checkpoints')
+        if not isdir(directory):
+            makedirs(directory)
+        self.path = join(directory, '%s-%s' % (
+            operation, sha1(key.encode('utf-8')).hexdigest()))
+        self.lock = Lock()
+
+    def load(self):
+        """Get the completed items.
+
+        Returns:
+            :dict: Mapping each completed item to its recorded value.
+        """
+        completed = {}
+        if exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as entries:
+                for entry in entries:
+                    try:
+                        item, value = loads(entry)
+                    except ValueError:
+                        # The entry being written when interrupted.
+                        continue
+                    completed[item] = value
+        return completed
+
+    def add(self, item, value):
+        """Record that an item has completed, safe to call from any thread.
+
+        Arguments:
+            :item: JSON encodable item which completed.
+            :value: JSON encodable value to record with the item.
+        """
+        entry = u'%s\n' % dumps([item, value])
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as entries:
+                entries.write(entry)
+
+    def remove(self):
+        """Discard all recorded items."""
+        if exists(self.path):
+            remove(self.path)
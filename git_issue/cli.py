@@ -4,19 +4,20 @@ from __future__ import print_function
 
 import warnings
 from argparse import SUPPRESS, ArgumentParser
+from itertools import islice
 from os import environ, remove
 from os.path import join
-from subprocess import (PIPE, CalledProcessError, Popen, check_call,
-                        check_output)
-from sys import exit, stderr, stdout
-from webbrowser import open_new_tab
+from subprocess import PIPE, CalledProcessError, Popen, check_call
+from sys import exit, modules, stderr, stdout
 
 from colorama import Fore
-from pick import pick
-from requests import ConnectionError
 
-from git_issue import GitIssueError, get_config, get_service
-from git_issue.service import IssueComment, IssueEvent
+from git_issue import (CONTEXT, GitIssueError, get_config, get_git_dir,
+                       get_service, get_service_name)
+from git_issue.service import Issue, IssueComment, IssueEvent
+
+# NOTE: Shell completion runs a command on every key press, modules which are
+# slow to import are only imported by the commands which use them.
 
 
 def _warn_(message):
@@ -48,10 +49,6 @@ def _print_exception_():
     exit(1)
 
 
-def _git_dir_():
-    return check_output(['git', 'rev-parse', '--git-dir']).decode().strip()
-
-
 def _colors_(reset):
     return {
         'reset': reset,
@@ -122,7 +119,11 @@ def _hex_to_term_(color):
 def _pick_user_(service, keyword):
     if keyword:
         users = service.user_search(keyword)
+        if not users:
+            raise GitIssueError('unable to find user: %s' % keyword)
+        service.resolve(users)
         if users:
+            from pick import pick
             message = '\
 Choose from multiple matches for: {} (select then press Enter)'
             user, _ = pick([u'%s' % user for user in users],
@@ -166,7 +167,7 @@ def _editor_(template='\n'):
         # TODO: Check if vim/vi/nano exist and use that
         # TODO: Use the default editor on Windows
         editor = 'vi'
-    path = join(_git_dir_(), 'ISSUEMSG')
+    path = join(get_git_dir(), 'ISSUEMSG')
     with open(path, 'w') as issuemsg:
         issuemsg.write(template)
     # TODO: Support configurable filetype
@@ -180,16 +181,28 @@ def _editor_(template='\n'):
     return message
 
 
-def _pager_(content):
-    if stdout.isatty:
+def _pager_(lines):
+    # Lines are written as soon as they are produced so that output appears
+    # while the remainder is still being fetched.
+    if stdout.isatty():
         process = Popen(['less', '-F', '-R', '-X', '-K'], stdin=PIPE)
         try:
-            process.stdin.write(content.encode('utf-8'))
-            process.communicate()
+            for line in lines:
+                process.stdin.write(('%s\n' % line).encode('utf-8'))
+                process.stdin.flush()
+            process.stdin.close()
         except IOError:
+            # The pager has exited, stop producing lines.
             pass
+        process.wait()
     else:
-        print(content)
+        try:
+            for line in lines:
+                print(line)
+            stdout.flush()
+        except IOError:
+            # The reader has exited, stop producing lines.
+            pass
 
 
 def _human_date_(date):
@@ -234,7 +247,42 @@ def _issue_summary_(issue, num_comments=0):
     return output
 
 
-def _finish_(action, number, url):
+def _issue_(service, number, cached):
+    if cached:
+        from git_issue.store import Store
+        store = Store(service)
+        try:
+            return store.issue(number)
+        finally:
+            store.close()
+    return service.issue(number)
+
+
+def _issues_(service, state, cached, **filters):
+    if cached:
+        from git_issue.service import filter_issues
+        from git_issue.store import Store
+        store = Store(service)
+        try:
+            issues = store.issues(state)
+        finally:
+            store.close()
+        return filter_issues(issues, **filters)
+    return service.issues(state, **filters)
+
+
+def _since_(since):
+    # Services expect UTC ISO 8601 dates, accept any date arrow can parse.
+    if since:
+        import arrow
+        try:
+            since = arrow.get(since)
+        except (arrow.parser.ParserError, ValueError, TypeError):
+            raise GitIssueError('invalid date: %s' % since)
+        return since.to('UTC').format('YYYY-MM-DDTHH:mm:ss') + 'Z'
+
+
+def _finished_(action, number, url):
     print('%(color)s%(action)s%(reset)s issue %(number)s: %(url)s' % {
         'color': {
             'Created': Fore.GREEN,
@@ -248,9 +296,87 @@ def _finish_(action, number, url):
         'number': number,
         'url': url
     })
+
+
+def _finish_(action, number, url):
+    _finished_(action, number, url)
     exit(0)
 
 
+def _failed_(subject, message):
+    print(
+        '%(red)serror:%(reset)s %(subject)s: %(message)s' % {
+            'red': Fore.RED,
+            'reset': Fore.RESET,
+            'subject': subject,
+            'message': message
+        },
+        file=stderr)
+
+
+def _targets_(service, kwargs, state):
+    # Issue numbers given on the command line followed by the issues in state
+    # which match the filter options.
+    numbers = kwargs.pop('numbers')
+    labels = kwargs.pop('filter_labels') or []
+    milestone = kwargs.pop('filter_milestone')
+    if not numbers and not labels and not milestone:
+        raise GitIssueError('no issues specified, give issue numbers or '
+                            '--filter-label or --filter-milestone')
+    targets = numbers
+    if labels or milestone:
+        targets += [issue for issue in service.issues(
+            state, labels=labels, milestone=milestone)]
+    # An issue given by number which also matches the filters, or given more
+    # than once, is only written once.
+    seen = set()
+    unique = []
+    for target in targets:
+        number = '%s' % (target.number
+                         if isinstance(target, Issue) else target)
+        if number not in seen:
+            seen.add(number)
+            unique.append(target)
+    return unique
+
+
+def _apply_(service, action, targets, check, prepare, write):
+    # Run check and write for each target, a single issue number behaves as
+    # it always has. Otherwise prepare is called once for all issues and they
+    # are fetched and written concurrently, failures are reported and
+    # counted rather than stopping the remaining issues.
+    if len(targets) == 1 and not isinstance(targets[0], Issue):
+        issue = service.issue(targets[0])
+        check(issue)
+        _finish_(action, *write(issue, prepare(issue)))
+    prepared = prepare(None)
+
+    def _run_(target):
+        issue = target if isinstance(target, Issue) else service.issue(target)
+        check(issue)
+        return write(issue, prepared)
+
+    from concurrent.futures import ThreadPoolExecutor
+    failed = 0
+    with ThreadPoolExecutor(service.session.workers) as executor:
+        futures = [(target, executor.submit(_run_, target))
+                   for target in targets]
+        for target, future in futures:
+            # Results are reported in the order the issues were given.
+            try:
+                _finished_(action, *future.result())
+            except (GitIssueError, _connection_error_()) as error:
+                failed += 1
+                _failed_('issue %s' % (target.number
+                                       if isinstance(target, Issue) else
+                                       target),
+                         getattr(error, 'message', error))
+    print('%s %s issue%s%s' % (action, len(targets) - failed,
+                               '' if len(targets) - failed == 1 else 's',
+                               ', %s failed' % failed if failed else ''))
+    exit(1 if failed else 0)
+
+
 def create(service, **kwargs):
     """Create a new issue."""
     assignee = _pick_user_(service, kwargs.pop('assignee', None))
@@ -272,89 +398,360 @@ def create(service, **kwargs):
         raise GitIssueError('aborting due to empty message')
     issue = service.create(
         title, body, assignee=assignee, labels=labels, milestone=milestone)
+    _store_(service, issue)
     _finish_('Created', issue.number, issue.url())
 
 
 def edit(service, **kwargs):
-    """Edit an existing issue."""
-    issue = service.issue(kwargs.pop('number'))
-    assignee = _pick_user_(service, kwargs.pop('assignee', None))
-    milestone = _check_milestone_(service, kwargs.pop('milestone', None))
-    labels = _check_labels_(service, kwargs.pop('labels', None))
-    if kwargs['no_message']:
+    """Edit existing issues."""
+    targets = _targets_(service, kwargs, 'open')
+
+    def _prepare_(issue):
+        assignee = _pick_user_(service, kwargs.pop('assignee', None))
+        milestone = _check_milestone_(service, kwargs.pop('milestone', None))
+        labels = _check_labels_(service, kwargs.pop('labels', None))
         title = None
         body = None
-    else:
-        if kwargs['message']:
-            message = kwargs.pop('message').splitlines().split('\\n')
-        else:
-            message = _editor_('\n'.join([
-                issue.title,
-                '<!-- This line will be ignored! Title above, body below. -->',
-                issue.body,
-            ]))
-            del message[1]
-        title = message[0] if message[0] != issue.title else None
-        body = '\n'.join(message[1:]) if len(message) > 1 else None
-    issue.edit(
-        title=title,
-        body=body,
-        assignee=assignee,
-        labels=labels,
-        milestone=milestone)
-    _finish_('Edited', issue.number, issue.url())
+        if not kwargs['no_message']:
+            if kwargs['message']:
+                message = kwargs.pop('message').split('\\n')
+            elif issue:
+                message = _editor_('\n'.join([
+                    issue.title,
+                    '<!-- This line will be ignored! Title above, body '
+                    'below. -->',
+                    issue.body,
+                ]))
+                del message[1]
+            else:
+                raise GitIssueError('editing multiple issues requires '
+                                    '--message or --no-message')
+            title = message[0] if not issue or message[0] != issue.title \
+                else None
+            body = '\n'.join(message[1:]) if len(message) > 1 else None
+        return {
+            'title': title,
+            'body': body,
+            'assignee': assignee,
+            'labels': labels,
+            'milestone': milestone,
+        }
 
+    def _write_(issue, changes):
+        issue = issue.edit(**changes)
+        _store_(service, issue)
+        return issue.number, issue.url()
 
-def comment(service, **kwargs):
-    """Comment on an existing issue."""
-    issue = service.issue(kwargs.pop('number'))
-    if kwargs['message']:
-        body = kwargs.pop('message')
-    else:
-        body = '\n'.join(_editor_())
-    if len(body.strip()) == 0:
-        raise GitIssueError('aborted due to empty message')
-    comment = issue.comment(body)
-    _finish_('Commented on', '%s' % issue.number, comment.url())
+    _apply_(service, 'Edited', targets, lambda issue: None, _prepare_,
+            _write_)
 
 
-def close(service, **kwargs):
-    """Close an existing open issue."""
-    issue = service.issue(kwargs.pop('number'))
-    if issue.state != 'open':
-        raise GitIssueError('issue %s is not open' % issue.number)
-    comment = None
-    if not kwargs['no_message']:
+def comment(service, **kwargs):
+    """Comment on existing issues."""
+    targets = _targets_(service, kwargs, 'open')
+
+    def _prepare_(issue):
         if kwargs['message']:
-            comment = kwargs.pop('message')
+            body = kwargs.pop('message')
         else:
-            comment = '\n'.join(_editor_())
-        if len(comment.strip()) == 0:
+            body = '\n'.join(_editor_())
+        if len(body.strip()) == 0:
             raise GitIssueError('aborted due to empty message')
-    issue = issue.close(comment=comment)
-    _finish_('Closed', issue.number, issue.url())
+        return body
+
+    def _write_(issue, body):
+        url = issue.comment(body).url()
+        _store_(service, issue, refresh=True)
+        return '%s' % issue.number, url
+
+    _apply_(service, 'Commented on', targets, lambda issue: None, _prepare_,
+            _write_)
+
+
+def close(service, **kwargs):
+    """Close existing open issues."""
+    targets = _targets_(service, kwargs, 'open')
+
+    def _check_(issue):
+        if issue.state != 'open':
+            raise GitIssueError('issue %s is not open' % issue.number)
+
+    def _prepare_(issue):
+        comment = None
+        if not kwargs['no_message']:
+            if kwargs['message']:
+                comment = kwargs.pop('message')
+            else:
+                comment = '\n'.join(_editor_())
+            if len(comment.strip()) == 0:
+                raise GitIssueError('aborted due to empty message')
+        return comment
+
+    def _write_(issue, comment):
+        issue = issue.close(comment=comment)
+        _store_(service, issue)
+        return issue.number, issue.url()
+
+    _apply_(service, 'Closed', targets, _check_, _prepare_, _write_)
 
 
 def reopen(service, **kwargs):
-    """Reopen an existing closed issue."""
-    issue = service.issue(kwargs.pop('number'))
-    if issue.state != 'closed':
-        raise GitIssueError('issue %s is not closed' % issue.number)
-    issue = issue.reopen()
-    _finish_('Reopened', issue.number, issue.url())
+    """Reopen existing closed issues."""
+    targets = _targets_(service, kwargs, 'closed')
 
+    def _check_(issue):
+        if issue.state != 'closed':
+            raise GitIssueError('issue %s is not closed' % issue.number)
 
-def show(service, **kwargs):
-    """Show detail of a single issue."""
-    issue = service.issue(kwargs.pop('number'))
+    def _write_(issue, prepared):
+        issue = issue.reopen()
+        _store_(service, issue)
+        return issue.number, issue.url()
+
+    _apply_(service, 'Reopened', targets, _check_, lambda issue: None,
+            _write_)
+
+
+def _find_users_(service, usernames):
+    # Map each username to the user found by searching for it exactly once,
+    # None when no user has exactly that username, or the GitIssueError when
+    # the search failed.
+    users = {}
+    for username in usernames:
+        try:
+            found = service.user_search(username)
+        except GitIssueError as error:
+            users[username] = error
+            continue
+        users[username] = next(
+            (user for user in found if user.username == username), None)
+    return users
+
+
+def import_(service, **kwargs):
+    """Create issues from a JSONL or CSV file."""
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+    from os.path import abspath
+    from git_issue.batch import Checkpoint, read_rows
+    path = kwargs.pop('file')
+    format = kwargs.pop('format')
+    checkpoint = Checkpoint('import', abspath(path))
+    if kwargs.pop('restart'):
+        checkpoint.remove()
+    created = checkpoint.load()
+
+    # Labels, milestones, and assignees are requested once for all rows, not
+    # once per row.
+    labels = {label.name: label for label in service.labels()}
+    milestones = {milestone.title: milestone
+                  for milestone in service.milestones()}
+    users = _find_users_(service, set([
+        row['assignee'] for number, row in read_rows(path, format)
+        if '%s' % number not in created and isinstance(row, dict) and
+        row['assignee']
+    ]))
+
+    def _create_(number, row):
+        if isinstance(row, GitIssueError):
+            raise row
+        for label in row['labels']:
+            if label not in labels:
+                raise GitIssueError('invalid label name: %s' % label)
+        if row['milestone'] and row['milestone'] not in milestones:
+            raise GitIssueError('invalid milestone: %s' % row['milestone'])
+        assignee = users[row['assignee']] if row['assignee'] else None
+        if isinstance(assignee, GitIssueError):
+            raise GitIssueError('failed to search for user %s: %s' %
+                                (row['assignee'], assignee.message))
+        if row['assignee'] and not assignee:
+            raise GitIssueError('unable to find user: %s' % row['assignee'])
+        issue = service.create(
+            row['title'], row['body'],
+            assignee=assignee,
+            labels=[labels[label] for label in row['labels']],
+            milestone=milestones.get(row['milestone']))
+        # Recorded as soon as it is created so that an interrupted import
+        # never creates the issue again when resumed.
+        checkpoint.add('%s' % number, '%s' % issue.number)
+        _store_(service, issue)
+        return issue.number, issue.url()
+
+    # Rows are submitted as earlier rows finish so that only a window of rows
+    # is in memory and results are reported in file order.
+    workers = service.session.workers
+    total = failed = skipped = 0
+    pending = deque()
+
+    def _report_(number, future):
+        try:
+            _finished_('Created', *future.result())
+            return 0
+        except (GitIssueError, _connection_error_()) as error:
+            _failed_('row %s' % number, getattr(error, 'message', error))
+            return 1
+
+    with ThreadPoolExecutor(workers) as executor:
+        for number, row in read_rows(path, format):
+            if '%s' % number in created:
+                skipped += 1
+                continue
+            total += 1
+            pending.append((number, executor.submit(_create_, number, row)))
+            if len(pending) > 2 * workers:
+                failed += _report_(*pending.popleft())
+        while pending:
+            failed += _report_(*pending.popleft())
+    print('Created %s issue%s%s%s' % (
+        total - failed, '' if total - failed == 1 else 's',
+        ', %s failed' % failed if failed else '',
+        ', %s already imported' % skipped if skipped else ''))
+    exit(1 if failed else 0)
+
+
+def export(service, **kwargs):
+    """Export all issues and their timelines as JSON lines."""
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+    from io import open
+    from json import dumps
+    from os.path import abspath
+    from git_issue.batch import Checkpoint, issue_record
+    # JSON lines is the only format, the option allows others to be added.
+    kwargs.pop('format')
+    output = kwargs.pop('output')
+    restart = kwargs.pop('restart')
+    exported = {}
+    if output:
+        checkpoint = Checkpoint(
+            'export', '%s:%s' % (get_service_name(), abspath(output)))
+        if restart:
+            checkpoint.remove()
+        exported = checkpoint.load()
+        # Append to the output of an interrupted export, which the
+        # checkpoint records the issues of.
+        stream = open(output, 'a' if exported else 'w', encoding='utf-8')
+    else:
+        checkpoint = None
+        stream = stdout
+
+    def _record_(issue):
+        return u'%s\n' % dumps(issue_record(issue, issue.timeline()),
+                               sort_keys=True)
+
+    # Timelines are fetched concurrently for a window of issues ahead of the
+    # issue being written, so memory use does not grow with the number of
+    # issues and they are written in the order they are listed.
+    workers = service.session.workers
+    pending = deque()
+
+    def _write_(issue, future):
+        stream.write(future.result())
+        stream.flush()
+        if checkpoint:
+            checkpoint.add('%r' % issue.number, issue.updated)
+
+    executor = ThreadPoolExecutor(workers)
+    try:
+        for issue in service.issues('all'):
+            if '%r' % issue.number in exported:
+                continue
+            pending.append((issue, executor.submit(_record_, issue)))
+            if len(pending) > 2 * workers:
+                _write_(*pending.popleft())
+        while pending:
+            _write_(*pending.popleft())
+        if checkpoint:
+            # Only an interrupted export resumes, the next export of the same
+            # file writes all issues again.
+            checkpoint.remove()
+    except IOError:
+        if stream is not stdout:
+            raise
+        # The reader has exited, stop exporting.
+    finally:
+        # Do not wait for the timelines of issues which will not be written.
+        for issue, future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+        if stream is not stdout:
+            stream.close()
+    exit(0)
+
+
+def _open_store_(service, timeout):
+    # Open the store only when it has been fetched, so commands which update
+    # it in passing never create it.
+    from os.path import exists
+    from git_issue.store import Store, get_store_path
+    if not exists(get_store_path(service)):
+        return None
+    store = Store(service, timeout=timeout)
+    if store.synced is None:
+        store.close()
+        return None
+    return store
+
+
+def _index_(service, issue, comments):
+    # Keep the search index of a fetched store up to date with the comments
+    # which were just requested.
+    from sqlite3 import OperationalError
+    try:
+        # Indexing is best effort, skipped rather than waiting when a sync
+        # holds the lock.
+        store = _open_store_(service, 0)
+    except OperationalError:
+        return
+    if store is None:
+        return
+    try:
+        with store.connection:
+            store.add(issue)
+            store.add_comments(issue, comments)
+    except OperationalError:
+        pass
+    finally:
+        store.close()
+
+
+def _store_(service, issue, refresh=False):
+    # Keep a fetched store up to date with an issue which was just written,
+    # list and show are answered from the store while the daemon is running.
+    # When refresh is set the issue is requested again to get its new state.
+    # The write has already succeeded, so failures are only warned about.
+    from sqlite3 import OperationalError
+    try:
+        store = _open_store_(service, 5.0)
+        if store is None:
+            return
+        try:
+            if refresh:
+                issue = service.issue('%r' % issue.number)
+            with store.connection:
+                store.add(issue)
+        finally:
+            store.close()
+    except (GitIssueError, OperationalError) as error:
+        _warn_('failed to update the local store: %s' %
+               getattr(error, 'message', error))
+
+
+def _show_(service, **kwargs):
+    issue = _issue_(service, kwargs.pop('number'), kwargs.pop('cached'))
     quiet = kwargs.pop('quiet')
     summary = kwargs.pop('summary')
+    items = [] if summary else issue.timeline(events=not quiet)
+    if not summary:
+        _index_(service, issue,
+                [item for item in items if isinstance(item, IssueComment)])
+    service.resolve([issue.author, issue.assignee] + [
+        item.author if isinstance(item, IssueComment) else item.actor
+        for item in items
+    ])
     output = _issue_summary_(issue, issue.num_comments if summary else 0)
     if not summary:
-        items = issue.comments()
-        if not quiet:
-            items += issue.events()
-        for item in sorted(items):
+        for item in items:
             if isinstance(item, IssueComment):
                 output += [
                     '',
@@ -376,73 +773,255 @@ def show(service, **kwargs):
                     },
                     'Actor:    %s' % item.actor,
                 ]
-    _pager_('\n'.join(output))
+    return output
+
+
+def show(service, **kwargs):
+    """Show detail of a single issue."""
+    _pager_(_show_(service, **kwargs))
     exit(0)
 
 
+def _list_oneline_(issues):
+    for issue in issues:
+        yield '%(yellow)s%(number)s (%(state)s)%(reset)s %(title)s' % {
+            'yellow': Fore.YELLOW,
+            'number': issue.number,
+            'state': _issue_state_(issue),
+            'reset': Fore.RESET,
+            'title': issue.title,
+        }
+
+
+def _list_summary_(service, issues):
+    issues = iter(issues)
+    while True:
+        # Resolve users in batches so output can begin before all issues
+        # have been fetched.
+        batch = [issue for issue in islice(issues, 30)]
+        if not batch:
+            break
+        service.resolve([issue.author for issue in batch] +
+                        [issue.assignee for issue in batch])
+        for issue in batch:
+            for line in _issue_summary_(issue, issue.num_comments):
+                yield line
+            yield ''
+
+
+def _list_(service, **kwargs):
+    issues = _issues_(service, kwargs.pop('state'), kwargs.pop('cached'),
+                      since=_since_(kwargs.pop('since')),
+                      labels=kwargs.pop('labels'),
+                      assignee=kwargs.pop('assignee'),
+                      author=kwargs.pop('author'),
+                      milestone=kwargs.pop('milestone'))
+    limit = kwargs.pop('limit')
+    if limit is not None:
+        issues = islice(issues, limit)
+    if kwargs.pop('oneline'):
+        return _list_oneline_(issues)
+    return _list_summary_(service, issues)
+
+
 def list(service, **kwargs):
     """List existing issues."""
+    _pager_(_list_(service, **kwargs))
+    exit(0)
+
+
+def fetch(service, **kwargs):
+    """Fetch issues into the local store."""
+    from git_issue.store import Store
+    store = Store(service)
+    try:
+        count = store.sync(full=kwargs.pop('full'),
+                           comments=kwargs.pop('comments'))
+    finally:
+        store.close()
+    print('Fetched %s issue%s' % (count, '' if count == 1 else 's'))
+    exit(0)
+
+
+def _search_(service, **kwargs):
+    from git_issue.store import Store
+    store = Store(service)
+    try:
+        results = store.search(' '.join(kwargs.pop('query')),
+                               limit=kwargs.pop('limit'),
+                               markers=(Fore.RED, Fore.RESET))
+    finally:
+        store.close()
     output = []
-    issues = service.issues(kwargs.pop('state'))
-    if kwargs.pop('oneline'):
-        for issue in issues:
-            output.append(
-                '%(yellow)s%(number)s (%(state)s)%(reset)s %(title)s' % {
-                    'yellow': Fore.YELLOW,
-                    'number': issue.number,
-                    'state': _issue_state_(issue),
-                    'reset': Fore.RESET,
-                    'title': issue.title,
-                })
-    else:
-        for issue in issues:
-            output += _issue_summary_(issue, issue.num_comments)
-            output.append('')
-    _pager_('\n'.join(output))
+    for issue, snippet in results:
+        output += _list_oneline_([issue])
+        output.append('    %s' % ' '.join(snippet.split()))
+    return output
+
+
+def search(service, **kwargs):
+    """Search the title, body, and comments of stored issues."""
+    _pager_(_search_(service, **kwargs))
     exit(0)
 
 
+def _browse_(service, **kwargs):
+    issue = _issue_(service, kwargs.pop('number'), kwargs.pop('cached', False))
+    return [issue.url()]
+
+
+def _open_url_(url, print_url):
+    if print_url:
+        print(url)
+    else:
+        from webbrowser import open_new_tab
+        open_new_tab(url)
+
+
 def browse(service, **kwargs):
     """Show issue in detault browser."""
-    issue = service.issue(kwargs.pop('number'))
-    if kwargs['url']:
-        print(issue.url())
-    else:
-        open_new_tab(issue.url())
+    url, = _browse_(service, **kwargs)
+    _open_url_(url, kwargs['url'])
     exit(0)
 
 
-def complete(service, **kwargs):
-    """Provide completions."""
+def ratelimit(service, **kwargs):
+    """Show the remaining request budget of the service."""
+    import arrow
+    rate_limits = service.rate_limits()
+    if not rate_limits:
+        print('%s does not report a rate limit' % get_service_name())
+        exit(0)
+    output = []
+    for name in sorted(rate_limits):
+        rate_limit = rate_limits[name]
+        output += [
+            '%s%s%s' % (Fore.YELLOW, name, Fore.RESET),
+            'Limit:     %s' % rate_limit.limit,
+            'Remaining: %s' % rate_limit.remaining,
+        ]
+        if rate_limit.reset:
+            reset = arrow.get(rate_limit.reset)
+            output.append('Reset:     %s (%s)' %
+                          (_human_date_(reset), reset.humanize()))
+        output.append('')
+    print('\n'.join(output[:-1]))
+    exit(0)
+
+
+def _complete_(service, **kwargs):
+    def _service_():
+        return service if service is not None else get_service()
+
     complete_type = kwargs.pop('type')
-    if complete_type == 'issues':
-        issues = service.issues(kwargs.pop('state', 'open'))
-        if 'zsh' in environ['SHELL']:
-            # In zsh display the issue title as the description
-            output = '\n'.join(['%r:%s' % (issue.number, issue.title)
-                                for issue in issues])
-        else:
-            # Otherwise just supply the issue number
-            output = '\n'.join(['%r' % issue.number for issue in issues])
-    if complete_type == 'labels':
-        output = '\n'.join(['%s' % label.name for label in service.labels()])
-    if complete_type == 'milestones':
-        output = '\n'.join(
-            [milestone.title for milestone in service.milestones()])
+    state = kwargs.pop('state', None) or 'open'
     if complete_type == 'states':
-        output = '\n'.join([state.name for state in service.states()])
-    print(output, end='')
+        return [issue_state.name for issue_state in _service_().states()]
+    if complete_type == 'issues' and kwargs.pop('cached'):
+        candidates = [['%r' % issue.number, issue.title]
+                      for issue in _issues_(_service_(), state, True)]
+    else:
+        from git_issue.completion import (COLD_LIMIT, CompletionCache,
+                                          get_candidates)
+        candidates = CompletionCache(get_service_name()).get(complete_type)
+        if candidates is None:
+            candidates = get_candidates(_service_(), complete_type, state,
+                                        limit=COLD_LIMIT)
+        elif complete_type == 'issues' and state != 'all':
+            candidates = [candidate for candidate in candidates
+                          if candidate[2] == state]
+    if complete_type != 'issues':
+        return candidates
+    if kwargs.pop('zsh'):
+        # In zsh display the issue title as the description
+        return ['%s:%s' % (candidate[0], candidate[1])
+                for candidate in candidates]
+    # Otherwise just supply the issue number
+    return [candidate[0] for candidate in candidates]
+
+
+def complete(service, **kwargs):
+    """Provide completions.
+
+    Issues, labels, and milestones are answered from the completion cache,
+    the service is only constructed when a refresh is requested or nothing is
+    cached yet, in which case a single page of candidates is requested.
+    """
+    if kwargs.pop('refresh'):
+        from git_issue.completion import CompletionCache
+        CompletionCache(get_service_name()).refresh(kwargs.pop('type'),
+                                                    get_service())
+        exit(0)
+    print('\n'.join(_complete_(service, **kwargs)), end='')
+    exit(0)
+
+
+def daemon(service, **kwargs):
+    """Sync in the background and serve commands to the command line."""
+    from git_issue.daemon import Daemon
+    Daemon(service, {
+        'list': _list_,
+        'show': _show_,
+        'complete': _complete_,
+        'browse': _browse_,
+    }).serve()
+
+
+def _run_in_daemon_(command, args):
+    from git_issue.daemon import COMMANDS, connect
+    if command.__name__ not in COMMANDS or args.get('refresh'):
+        return
+    client = connect()
+    if client is None:
+        return
+    lines = client.request(command.__name__, args, tty=stdout.isatty())
+    if command is complete:
+        print('\n'.join(lines), end='')
+    elif command is browse:
+        url, = lines
+        _open_url_(url, args['url'])
+    else:
+        _pager_(lines)
     exit(0)
 
 
+def _connection_error_():
+    # Connection errors and timeouts can only be raised once requests has been
+    # imported, otherwise match nothing rather than importing it.
+    requests = modules.get('requests')
+    return (requests.ConnectionError, requests.Timeout) if requests else ()
+
+
+def _timed_out_(error):
+    # Requests which time out on their last retry raise a ConnectionError
+    # whose reason is the timeout.
+    from requests import Timeout
+    from urllib3.exceptions import NewConnectionError, TimeoutError
+    if isinstance(error, Timeout):
+        return True
+    reason = getattr(error.args[0] if error.args else None, 'reason', None)
+    # A refused connection is a NewConnectionError, which urllib3 derives
+    # from ConnectTimeoutError.
+    return isinstance(reason, TimeoutError) and \
+        not isinstance(reason, NewConnectionError)
+
+
+def _add_targets_(parser):
+    parser.add_argument(
+        '--filter-label', action='append', dest='filter_labels')
+    parser.add_argument('--filter-milestone')
+    parser.add_argument('numbers', nargs='*')
+
+
 def main():
     """Main entry point."""
     try:
-        warnings.showwarning = lambda *args: _warn_(args[0].message)
+        warnings.showwarning = lambda *args: _warn_('%s' % args[0])
 
         parser = ArgumentParser()
         parser.add_argument(
             '-d', '--debug', action='store_true', help=SUPPRESS)
+        parser.add_argument('--no-resolve-users', action='store_true')
         subparsers = parser.add_subparsers()
 
         create_parser = subparsers.add_parser('create')
@@ -462,34 +1041,66 @@ def main():
         edit_parser.add_argument('-s', '--milestone')
         edit_parser.add_argument(
             '-l', '--label', action='append', dest='labels')
-        edit_parser.add_argument('number')
+        _add_targets_(edit_parser)
 
         comment_parser = subparsers.add_parser('comment')
         comment_parser.set_defaults(_command_=comment)
         comment_parser.add_argument('-m', '--message')
-        comment_parser.add_argument('number')
+        _add_targets_(comment_parser)
 
         close_parser = subparsers.add_parser('close')
         close_parser.set_defaults(_command_=close)
         close_parser.add_argument('-m', '--message')
         close_parser.add_argument('-n', '--no-message', action='store_true')
-        close_parser.add_argument('number')
+        _add_targets_(close_parser)
 
         reopen_parser = subparsers.add_parser('reopen')
         reopen_parser.set_defaults(_command_=reopen)
-        reopen_parser.add_argument('number')
+        _add_targets_(reopen_parser)
+
+        import_parser = subparsers.add_parser('import')
+        import_parser.set_defaults(_command_=import_)
+        import_parser.add_argument('--format', choices=['jsonl', 'csv'])
+        import_parser.add_argument('--restart', action='store_true')
+        import_parser.add_argument('file')
+
+        export_parser = subparsers.add_parser('export')
+        export_parser.set_defaults(_command_=export)
+        export_parser.add_argument(
+            '--format', choices=['jsonl'], default='jsonl')
+        export_parser.add_argument('-o', '--output')
+        export_parser.add_argument('--restart', action='store_true')
 
         show_parser = subparsers.add_parser('show')
         show_parser.set_defaults(_command_=show)
         show_parser.add_argument('--summary', action='store_true')
+        show_parser.add_argument('--cached', action='store_true')
         show_parser.add_argument('-q', '--quiet', action='store_true')
         show_parser.add_argument('number')
 
         list_parser = subparsers.add_parser('list')
         list_parser.set_defaults(_command_=list)
         list_parser.add_argument('--oneline', action='store_true')
+        list_parser.add_argument('--cached', action='store_true')
+        list_parser.add_argument('--limit', type=int)
+        list_parser.add_argument(
+            '-l', '--label', action='append', dest='labels')
+        list_parser.add_argument('-a', '--assignee')
+        list_parser.add_argument('--author')
+        list_parser.add_argument('-s', '--milestone')
+        list_parser.add_argument('--since')
         list_parser.add_argument('state', default='open', nargs='?')
 
+        fetch_parser = subparsers.add_parser('fetch')
+        fetch_parser.set_defaults(_command_=fetch)
+        fetch_parser.add_argument('--full', action='store_true')
+        fetch_parser.add_argument('--comments', action='store_true')
+
+        search_parser = subparsers.add_parser('search')
+        search_parser.set_defaults(_command_=search)
+        search_parser.add_argument('--limit', type=int, default=20)
+        search_parser.add_argument('query', nargs='+')
+
         browse_parser = subparsers.add_parser('browse')
         browse_parser.set_defaults(_command_=browse)
         browse_parser.add_argument('-u', '--url', action='store_true')
@@ -501,21 +1112,48 @@ def main():
             'type', choices=['issues', 'labels', 'milestones', 'states'])
         complete_parser.add_argument(
             '--state', choices=['all', 'open', 'closed'])
+        complete_parser.add_argument('--cached', action='store_true')
+        complete_parser.add_argument(
+            '--refresh', action='store_true', help=SUPPRESS)
+        complete_parser.set_defaults(
+            zsh='zsh' in environ.get('SHELL', ''))
+
+        daemon_parser = subparsers.add_parser('daemon')
+        daemon_parser.set_defaults(_command_=daemon)
+
+        ratelimit_parser = subparsers.add_parser('ratelimit')
+        ratelimit_parser.set_defaults(_command_=ratelimit)
 
         args = vars(parser.parse_args())
         debug = args.pop('debug')
+        # Model objects are only validated when debugging.
+        CONTEXT['debug'] = debug
+        resolve_users = not args.pop('no_resolve_users')
         command = args.pop('_command_')
-        command(get_service(), **args)
+        if resolve_users and not debug:
+            # Exits when the command was run by the daemon.
+            _run_in_daemon_(command, args)
+        if command is complete:
+            # Completions are answered from the completion cache, the service
+            # is only constructed when it is needed.
+            service = None
+        else:
+            service = get_service()
+            service.resolve_users = resolve_users
+        command(service, **args)
     except GitIssueError as error:
         if debug:
             _print_exception_()
         _error_(error.message)
-    except ConnectionError:
+    except _connection_error_() as error:
         if debug:
             _print_exception_()
         service_name = get_config('issue.service')
-        _error_('authentication failed, check that:'
-                '\n* issue.{0}.token is correct'
+        if _timed_out_(error):
+            _error_('request timed out, the service may be slow or '
+                    'unreachable, the timeout is set by issue.{0}.timeout'
+                    .format(service_name))
+        _error_('failed to connect, check that:'
                 '\n* issue.{0}.url is correct, if applicable'
                 '\n* issue.{0}.remote is correct, if applicable'
                 '\n* issue.{0}.https is correct, if applicable'
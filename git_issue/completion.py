@@ -0,0 +1,171 @@
+"""Shell completion cache."""
+
+from __future__ import print_function
+
+from itertools import islice
+from json import dump, load
+from os import O_CREAT, O_EXCL, O_WRONLY, close, devnull, fdopen, makedirs
+from os import open as open_fd
+from os import remove, rename
+from os.path import getmtime, isdir, join
+from subprocess import CalledProcessError, Popen
+from sys import executable
+from tempfile import mkstemp
+from time import time
+
+from git_issue import GitIssueError, get_cache_dir, get_config
+
+try:
+    from os import setsid
+except ImportError:
+    # Windows has no sessions, the refresh is still not waited for.
+    setsid = None
+
+# Kinds of candidate which are cached, states are known without a request.
+KINDS = ['issues', 'labels', 'milestones']
+
+# Number of issues requested when nothing is cached, small enough to be
+# answered by the first page of every service.
+COLD_LIMIT = 10
+
+# Seconds after which a refresh which has not finished is assumed to have
+# died and another may be started.
+REFRESH_TIMEOUT = 60
+
+
+def issue_candidate(issue):
+    """Get the completion candidate of an issue.
+
+    Arguments:
+        :issue: ``Issue`` to complete.
+
+    Returns:
+        :list: ``[number, title, state]`` of the issue.
+    """
+    # Services name the open state differently, e.g. GitLab uses "opened".
+    return ['%r' % issue.number, issue.title,
+            'closed' if issue.state == 'closed' else 'open']
+
+
+def get_candidates(service, kind, state='all', limit=None):
+    """Get completion candidates from the service.
+
+    Arguments:
+        :service: ``Service`` to request candidates from.
+        :kind: Kind of candidate, one of ``KINDS``.
+
+    Keyword Arguments:
+        :state: State name of issues to get, ``'open'``, ``'closed'``, or
+        ``'all'``.
+        :limit: Maximum number of issues to get (optional).
+
+    Returns:
+        :list: Issue candidates are ``[number, title, state]`` lists, other
+        candidates are names.
+    """
+    if kind == 'issues':
+        return [issue_candidate(issue)
+                for issue in islice(service.issues(state), limit)]
+    if kind == 'labels':
+        return ['%s' % label.name for label in service.labels()]
+    if kind == 'milestones':
+        return [milestone.title for milestone in service.milestones()]
+    raise GitIssueError('invalid completion type: %s' % kind)
+
+
+class CompletionCache(object):
+    """Cache of shell completion candidates.
+
+    Candidates are stored in the ``complete`` directory of the cache
+    directory, one file per service and kind of candidate, and are fresh for
+    ``issue.completionttl`` seconds, defaults to five minutes. Stale
+    candidates are still returned so that completion never waits for the
+    service, instead a detached ``git-issue complete --refresh`` process is
+    started to replace them. A lock file ensures only one refresh of each kind
+    runs at a time.
+
+    Arguments:
+        :name: Name of the configured service.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        try:
+            self.ttl = int(get_config('issue.completionttl'))
+        except CalledProcessError:
+            self.ttl = 5 * 60
+        except ValueError:
+            raise GitIssueError(
+                'invalid issue.completionttl expected integer')
+        self.directory = join(get_cache_dir(), 'complete')
+        if not isdir(self.directory):
+            makedirs(self.directory)
+
+    def _path_(self, kind):
+        return join(self.directory, '%s-%s.json' % (self.name, kind))
+
+    def get(self, kind):
+        """Get cached candidates, starting a refresh if they are stale.
+
+        Arguments:
+            :kind: Kind of candidate, one of ``KINDS``.
+
+        Returns:
+            :list: Cached candidates, ``None`` if nothing is cached.
+        """
+        path = self._path_(kind)
+        try:
+            with open(path, 'r') as entry:
+                candidates = load(entry)
+            stale = time() - getmtime(path) > self.ttl
+        except (IOError, OSError, ValueError):
+            candidates, stale = None, True
+        if stale:
+            self._start_refresh_(kind)
+        return candidates
+
+    def _start_refresh_(self, kind):
+        lock = '%s.lock' % self._path_(kind)
+        try:
+            if time() - getmtime(lock) < REFRESH_TIMEOUT:
+                return
+            remove(lock)
+        except OSError:
+            pass
+        try:
+            close(open_fd(lock, O_CREAT | O_EXCL | O_WRONLY))
+        except OSError:
+            # Another completion started a refresh first.
+            return
+        with open(devnull, 'r+') as null:
+            Popen([executable, '-m', 'git_issue.cli', 'complete',
+                   '--refresh', kind], stdin=null, stdout=null, stderr=null,
+                  close_fds=True, preexec_fn=setsid)
+
+    def refresh(self, kind, service):
+        """Replace cached candidates with those requested from the service.
+
+        Arguments:
+            :kind: Kind of candidate, one of ``KINDS``.
+            :service: ``Service`` to request candidates from.
+        """
+        try:
+            self.update(kind, get_candidates(service, kind))
+        finally:
+            try:
+                remove('%s.lock' % self._path_(kind))
+            except OSError:
+                pass
+
+    def update(self, kind, candidates):
+        """Replace cached candidates.
+
+        Arguments:
+            :kind: Kind of candidate, one of ``KINDS``.
+            :candidates: ``list`` of candidates as returned by
+            ``get_candidates()``.
+        """
+        fd, temp = mkstemp(dir=self.directory)
+        with fdopen(fd, 'w') as entry:
+            dump(candidates, entry)
+        rename(temp, self._path_(kind))
@@ -0,0 +1,242 @@
+"""Background sync daemon and its client."""
+
+from __future__ import print_function
+
+import socket
+from errno import ECONNRESET, EPIPE
+from json import dumps, loads
+from os import remove
+from os.path import exists, join
+from signal import SIGTERM, signal
+from subprocess import CalledProcessError
+from sys import exit
+from threading import Event, Thread
+from warnings import warn
+
+from git_issue import (OUTPUT, GitIssueError, get_cache_dir, get_config,
+                       get_service_name)
+
+try:
+    from socketserver import StreamRequestHandler, ThreadingUnixStreamServer
+except ImportError:
+    from SocketServer import StreamRequestHandler, ThreadingUnixStreamServer
+
+# Commands which the daemon can serve, all others are run directly.
+COMMANDS = ['list', 'show', 'complete', 'browse']
+
+
+def get_socket_path():
+    """Get the path of the daemon socket for the current repository.
+
+    Returns:
+        :str: Path of ``daemon.sock`` in the cache directory.
+    """
+    return join(get_cache_dir(), 'daemon.sock')
+
+
+def _send_(stream, message):
+    stream.write(('%s\n' % dumps(message)).encode('utf-8'))
+    stream.flush()
+
+
+def connect():
+    """Connect to the daemon of the current repository.
+
+    Returns:
+        :Client: Connected client, ``None`` if the daemon is not running.
+    """
+    path = get_socket_path()
+    if not exists(path):
+        return None
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(path)
+    except socket.error:
+        # The socket was left behind by a daemon which is no longer running.
+        connection.close()
+        return None
+    return Client(connection)
+
+
+class Client(object):
+    """Client of a running daemon.
+
+    Arguments:
+        :connection: ``socket`` connected to the daemon.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def request(self, command, args, tty=False):
+        """Run a command in the daemon.
+
+        Arguments:
+            :command: Name of the command, one of ``COMMANDS``.
+            :args: ``dict`` of parsed command line arguments.
+
+        Keyword Arguments:
+            :tty: Whether the output is written to a terminal, the daemon
+            renders the output accordingly.
+
+        Yields:
+            Each line of output as it is produced by the daemon.
+
+        Raises:
+            :GitIssueError: If the command failed in the daemon.
+        """
+        stream = self.connection.makefile('rwb')
+        try:
+            _send_(stream, {'command': command, 'args': args, 'tty': tty})
+            for message in stream:
+                message = loads(message.decode('utf-8'))
+                if 'error' in message:
+                    raise GitIssueError(message['error'])
+                if 'line' not in message:
+                    break
+                yield message['line']
+        finally:
+            stream.close()
+            self.connection.close()
+
+
+def _disconnected_(error):
+    # The client stopped reading, e.g. its output was piped to head(1).
+    return error.errno in [EPIPE, ECONNRESET]
+
+
+class _Handler_(StreamRequestHandler):
+    def handle(self):
+        try:
+            self._reply_(loads(self.rfile.readline().decode('utf-8')))
+        except socket.error as error:
+            if not _disconnected_(error):
+                raise
+
+    def _reply_(self, request):
+        # Render the output for the clients terminal, not the daemons.
+        OUTPUT.tty = request.get('tty', False)
+        try:
+            for line in self.server.daemon.run(request['command'],
+                                               request['args']):
+                _send_(self.wfile, {'line': line})
+            _send_(self.wfile, {})
+        except socket.error as error:
+            if _disconnected_(error):
+                raise
+            _send_(self.wfile, {'error': 'daemon: %s' % error})
+        except GitIssueError as error:
+            _send_(self.wfile, {'error': error.message})
+        except Exception as error:
+            _send_(self.wfile, {'error': 'daemon: %s' % error})
+        finally:
+            OUTPUT.tty = None
+
+
+class Daemon(object):
+    """Background sync daemon for the current repository.
+
+    Every ``issue.daemoninterval`` seconds, defaults to one minute, the
+    daemon syncs the local store and refreshes the completion cache, the
+    session revalidates unchanged responses with conditional requests. The
+    ``list``, ``show``, ``complete``, and ``browse`` commands are served over
+    a Unix domain socket in the cache directory using the already configured
+    service, its kept alive connections, and the synced store.
+
+    Arguments:
+        :service: ``Service`` to sync and serve.
+        :commands: ``dict`` mapping command names to functions which take
+        the service and command arguments and return the output lines.
+    """
+
+    def __init__(self, service, commands):
+        self.service = service
+        self.commands = commands
+        try:
+            self.interval = int(get_config('issue.daemoninterval'))
+        except CalledProcessError:
+            self.interval = 60
+        except ValueError:
+            raise GitIssueError(
+                'invalid issue.daemoninterval expected integer')
+        self.path = get_socket_path()
+        self.synced = False
+        self.stopped = Event()
+
+    def sync(self):
+        """Sync the local store and refresh the completion cache."""
+        from git_issue.completion import CompletionCache, issue_candidate
+        from git_issue.store import Store
+        # Users, labels, and milestones cached by the service may have
+        # changed.
+        self.service.invalidate()
+        store = Store(self.service)
+        try:
+            store.sync()
+            self.synced = True
+            cache = CompletionCache(get_service_name())
+            cache.update('issues', [
+                issue_candidate(issue) for issue in store.issues('all')
+            ])
+            cache.refresh('labels', self.service)
+            cache.refresh('milestones', self.service)
+        finally:
+            store.close()
+
+    def _poll_(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as error:
+                message = getattr(error, 'message', None) or error
+                warn('sync failed: %s' % message)
+            if self.stopped.wait(self.interval):
+                break
+
+    def run(self, command, args):
+        """Run a command using the synced store when possible.
+
+        Arguments:
+            :command: Name of the command, one of ``COMMANDS``.
+            :args: ``dict`` of parsed command line arguments.
+
+        Returns:
+            :iterable: Lines of output.
+        """
+        if command not in self.commands:
+            raise GitIssueError('daemon: unsupported command: %s' % command)
+        if command == 'complete' or not self.synced or args.get('cached'):
+            return self.commands[command](self.service, **args)
+        try:
+            return self.commands[command](self.service,
+                                          **dict(args, cached=True))
+        except GitIssueError:
+            # The issue was created since the last sync.
+            return self.commands[command](self.service, **args)
+
+    def serve(self):
+        """Serve requests until interrupted."""
+        connection = connect()
+        if connection:
+            connection.connection.close()
+            raise GitIssueError('daemon already running: %s' % self.path)
+        if exists(self.path):
+            remove(self.path)
+        try:
+            server = ThreadingUnixStreamServer(self.path, _Handler_)
+        except socket.error as error:
+            raise GitIssueError('failed to listen on %s: %s' %
+                                (self.path, error))
+        server.daemon = self
+        server.daemon_threads = True
+        poller = Thread(target=self._poll_)
+        poller.daemon = True
+        poller.start()
+        # Remove the socket when terminated, not only when interrupted.
+        signal(SIGTERM, lambda *args: exit(0))
+        try:
+            server.serve_forever()
+        finally:
+            self.stopped.set()
+            server.server_close()
+            remove(self.path)
@@ -3,18 +3,21 @@
 from __future__ import print_function
 
 from builtins import str, super
-
-import arrow
-from git_issue import GitIssueError
-from git_issue.service import (Issue, IssueComment, IssueEvent, IssueNumber,
-                               IssueState, Label, Milestone, Service, User,
-                               get_protocol, get_repo_owner_name, get_resource,
-                               get_token)
-from past.builtins import basestring
-from requests import get, patch, post
-from requests.auth import HTTPBasicAuth
-
-CACHE = {'users': {}}
+from json import dump, load
+from os import fdopen, rename
+from os.path import exists, join
+from subprocess import CalledProcessError
+from tempfile import mkstemp
+from threading import Lock
+from time import time
+
+from git_issue import GitIssueError, get_cache_dir, get_config
+from git_issue.service import (Context, Issue, IssueComment, IssueEvent,
+                               IssueNumber, IssueState, Label, Milestone,
+                               Service, User, basestring, filter_issues,
+                               get_all, get_pages, get_protocol,
+                               get_repo_owner_name, get_resource,
+                               get_session, get_token)
 
 
 def _check_assignee_(assignee):
@@ -47,13 +50,17 @@ class GitHub(Service):
         super().__init__()
         protocol = get_protocol('GitHub')
         resource = get_resource('GitHub')
+        owner_name = get_repo_owner_name('GitHub')
         self.url = '%s://%s' % (protocol, resource)
         self.api_url = '%s://api.%s' % (protocol, resource)
-        self.repos_url = '%s/repos/%s' % (self.api_url,
-                                          get_repo_owner_name('GitHub'))
+        self.repos_url = '%s/repos/%s' % (self.api_url, owner_name)
         self.issues_url = '%s/issues' % self.repos_url
-        self.auth = HTTPBasicAuth(*tuple(get_token('GitHub').split(':')))
-        self.headers = {'Accept': 'application/vnd.github.v3+json'}
+        self.session = get_session(
+            'GitHub', auth=tuple(get_token('GitHub').split(':')),
+            headers={'Accept': 'application/vnd.github.v3+json'})
+        self.users = GitHubUserDirectory(self.session)
+        self.context = Context(self.session, '%s/%s' % (self.url, owner_name),
+                               self.repos_url)
 
     def create(self, title, body, **kwargs):
         # title (string) Required. The title of the issue.
@@ -77,63 +84,81 @@ class GitHub(Service):
         labels = _check_labels_(kwargs.pop('labels', []))
         if len(labels) > 0:
             data['labels'] = [label.name for label in labels]
-        response = post(
-            self.issues_url, auth=self.auth, headers=self.headers, json=data)
+        response = self.session.post(self.issues_url, json=data)
         if response.status_code == 201:
-            return GitHubIssue(response.json(), self.auth, self.headers)
+            return GitHubIssue(response.json(), self.context)
         else:
             raise GitIssueError(response)
 
     def issue(self, number):
-        response = get('%s/issues/%s' % (self.repos_url, number),
-                       auth=self.auth,
-                       headers=self.headers)
+        response = self.session.get('%s/issues/%s' % (self.repos_url, number))
         if response.status_code == 200:
-            return GitHubIssue(response.json(), self.auth, self.headers)
+            return GitHubIssue(response.json(), self.context)
         else:
             raise GitIssueError(response)
         raise GitIssueError('could not find issue: %s' % number)
 
-    def issues(self, state):
+    def issues(self, state, since=None, **filters):
         states = self.states()
         if state not in [s.name for s in states]:
             raise GitIssueError('state must be one of %s' %
                                 ', '.join(['"%s"' % s.name for s in states]))
-        issues = []
-        next_url = self.issues_url
-        while next_url:
-            response = get(next_url,
-                           auth=self.auth,
-                           headers=self.headers,
-                           params={'state': state})
-            if response.status_code == 200:
-                issues += [GitHubIssue(issue, self.auth, self.headers)
-                           for issue in response.json()]
-                # If a link to the next page of issues present, use it.
-                next_url = response.links['next'][
-                    'url'] if 'next' in response.links else None
-            else:
-                raise GitIssueError(response)
-        return issues
+        params = {'state': state}
+        if since:
+            # since (string) Only issues updated at or after this time are
+            # returned.
+            params['since'] = since
+        # labels (string) A list of comma separated label names, issues must
+        # have all of them.
+        labels = filters.pop('labels', None)
+        if labels:
+            params['labels'] = ','.join(labels)
+        # assignee (string) Login of the user assigned to the issues.
+        assignee = filters.pop('assignee', None)
+        if assignee:
+            params['assignee'] = assignee
+        # creator (string) Login of the user who created the issues.
+        author = filters.pop('author', None)
+        if author:
+            params['creator'] = author
+        # milestone (integer or string) Number of the milestone.
+        milestone = filters.pop('milestone', None)
+        if milestone:
+            params['milestone'] = self._milestone_number_(milestone)
+        return filter_issues(self._issues_(params), **filters)
+
+    def _milestone_number_(self, title):
+        # Issues are filtered by milestone number, closed milestones are only
+        # listed when requested.
+        for milestone in get_all(self.session,
+                                 '%s/milestones' % self.repos_url,
+                                 {'state': 'all', 'per_page': 100}):
+            if milestone['title'] == title:
+                return milestone['number']
+        raise GitIssueError('invalid milestone: %s' % title)
+
+    def _issues_(self, params):
+        for page in get_pages(self.session, self.issues_url, params):
+            for issue in page:
+                yield GitHubIssue(issue, self.context)
+
+    def load(self, data):
+        return GitHubIssue(data, self.context)
 
     def states(self):
         return [GitHubIssueState('open'), GitHubIssueState('closed'),
                 GitHubIssueState('all')]
 
     def user_search(self, keyword):
-        response = get('%s/search/users' % self.api_url,
-                       auth=self.auth,
-                       headers=self.headers,
-                       params={'q': keyword})
+        response = self.session.get('%s/search/users' % self.api_url,
+                                    params={'q': keyword})
         if response.status_code == 200:
             return [GitHubUser(user) for user in response.json()['items']]
         else:
             raise GitIssueError(response)
 
     def labels(self):
-        response = get('%s/labels' % self.repos_url,
-                       auth=self.auth,
-                       headers=self.headers)
+        response = self.session.get('%s/labels' % self.repos_url)
         if response.status_code == 200:
             labels = [GitHubLabel(label) for label in response.json()]
         else:
@@ -141,9 +166,7 @@ class GitHub(Service):
         return labels
 
     def milestones(self):
-        response = get('%s/milestones' % self.repos_url,
-                       auth=self.auth,
-                       headers=self.headers)
+        response = self.session.get('%s/milestones' % self.repos_url)
         if response.status_code == 200:
             milestones = [GitHubMilestone(milestones)
                           for milestones in response.json()]
@@ -151,11 +174,284 @@ class GitHub(Service):
             raise GitIssueError(response)
         return milestones
 
+    def rate_limits(self):
+        # GitHub reports each budget, requesting them does not use any.
+        from git_issue.session import RateLimit
+        response = self.session.get('%s/rate_limit' % self.api_url)
+        if response.status_code != 200:
+            raise GitIssueError(response)
+        return {
+            name: RateLimit(resource['limit'], resource['remaining'],
+                            resource['reset'])
+            for name, resource in response.json()['resources'].items()
+        }
+
+    def resolve(self, users):
+        if self.resolve_users:
+            self.users.resolve(
+                [user for user in users if isinstance(user, GitHubUser)])
+
+
+# Fields of an issue requested from the GraphQL API, these are converted to
+# the shape of the REST API by GitHubGraphQL._issue_data_().
+ISSUE_FIELDS = '''
+fragment issueFields on Issue {
+  databaseId number title body state createdAt updatedAt url
+  author { login url ...userFields }
+  assignees(first: 1) { nodes { login url ...userFields } }
+  labels(first: 100) { nodes { id name color } }
+  milestone { id number title description dueOn state }
+  comments { totalCount }
+}
+fragment userFields on User { databaseId name }
+'''
+
+ISSUES_QUERY = '''
+query($owner: String!, $name: String!, $states: [IssueState!],
+      $since: DateTime, $labels: [String!], $assignee: String,
+      $createdBy: String, $milestoneNumber: String, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    issues(first: 100, after: $cursor, states: $states, labels: $labels,
+           filterBy: {since: $since, assignee: $assignee,
+                      createdBy: $createdBy,
+                      milestoneNumber: $milestoneNumber},
+           orderBy: {field: CREATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes { ...issueFields }
+    }
+  }
+}
+''' + ISSUE_FIELDS
+
+ISSUE_QUERY = '''
+query($owner: String!, $name: String!, $number: Int!) {
+  repository(owner: $owner, name: $name) {
+    issue(number: $number) { ...issueFields }
+  }
+}
+''' + ISSUE_FIELDS
+
+
+class GitHubGraphQL(GitHub):
+    """GitHub Service implementation using the GraphQL API to get issues.
+
+    Issues are requested 100 at a time and include the name of their author
+    and assignee, listing issues then only requires one request per 100
+    issues. Emails are only available to tokens with the ``user:email`` scope
+    so, as for the REST API, they are resolved by ``GitHubUserDirectory``. All
+    other operations use the REST API and the ``issue.GitHub`` config
+    options.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.owner, self.name = get_repo_owner_name('GitHub').split('/')
+        self.graphql_url = '%s/graphql' % self.api_url
+
+    def _query_(self, query, **variables):
+        variables.update({'owner': self.owner, 'name': self.name})
+        response = self.session.post(self.graphql_url,
+                                     json={'query': query,
+                                           'variables': variables})
+        if response.status_code != 200:
+            raise GitIssueError(response)
+        result = response.json()
+        if result.get('errors'):
+            raise GitIssueError('\n'.join(
+                [error['message'] for error in result['errors']]))
+        return result['data']['repository']
+
+    def _user_data_(self, user):
+        if not user:
+            # Deleted users are replaced by the ghost user.
+            user = {'login': 'ghost', 'url': 'https://github.com/ghost',
+                    'databaseId': 10137, 'name': None}
+        return {
+            'login': user['login'],
+            'id': user.get('databaseId'),
+            'url': '%s/users/%s' % (self.api_url, user['login']),
+            # Bots do not have a name, empty means not public.
+            'name': user.get('name') or None,
+        }
+
+    def _issue_data_(self, node):
+        url = '%s/%s' % (self.issues_url, node['number'])
+        assignees = node['assignees']['nodes']
+        milestone = node['milestone']
+        return {
+            'id': node['databaseId'],
+            'number': node['number'],
+            'title': node['title'],
+            'body': node['body'],
+            'state': node['state'].lower(),
+            'user': self._user_data_(node['author']),
+            'created_at': node['createdAt'],
+            'updated_at': node['updatedAt'],
+            'assignee': self._user_data_(assignees[0]) if assignees else None,
+            'labels': node['labels']['nodes'],
+            'milestone': {
+                'id': milestone['id'],
+                'number': milestone['number'],
+                'title': milestone['title'],
+                'description': milestone['description'] or '',
+                'due_on': milestone['dueOn'],
+                'state': milestone['state'].lower(),
+            } if milestone else None,
+            'comments': node['comments']['totalCount'],
+            'url': url,
+            'comments_url': '%s/comments' % url,
+            'events_url': '%s/events' % url,
+            'html_url': node['url'],
+        }
+
+    def issue(self, number):
+        try:
+            number = int(number)
+        except ValueError:
+            raise GitIssueError('invalid issue number: %s' % number)
+        issue = self._query_(ISSUE_QUERY, number=number)['issue']
+        if not issue:
+            raise GitIssueError('issue not found')
+        return GitHubIssue(self._issue_data_(issue), self.context)
+
+    def issues(self, state, since=None, **filters):
+        states = self.states()
+        if state not in [s.name for s in states]:
+            raise GitIssueError('state must be one of %s' %
+                                ', '.join(['"%s"' % s.name for s in states]))
+        milestone = filters.pop('milestone', None)
+        labels = filters.pop('labels', None) or None
+        if labels and len(labels) > 1:
+            # filterBy labels matches issues with any of the labels, issues
+            # must have all of them.
+            filters['labels'] = labels
+        variables = {
+            'states': None if state == 'all' else [state.upper()],
+            'since': since,
+            'labels': labels,
+            'assignee': filters.pop('assignee', None),
+            'createdBy': filters.pop('author', None),
+            'milestoneNumber': '%s' % self._milestone_number_(milestone)
+            if milestone else None,
+        }
+        return filter_issues(self._graphql_issues_(variables), **filters)
+
+    def _graphql_issues_(self, variables):
+        cursor = None
+        while True:
+            issues = self._query_(ISSUES_QUERY, cursor=cursor,
+                                  **variables)['issues']
+            for node in issues['nodes']:
+                yield GitHubIssue(self._issue_data_(node), self.context)
+            if not issues['pageInfo']['hasNextPage']:
+                break
+            cursor = issues['pageInfo']['endCursor']
+
+
+class GitHubUserDirectory(object):
+    """Persistent directory of GitHub user details.
+
+    GitHub does not include the name or email of users in issues, comments, or
+    events so each must be fetched separately. Details are stored in
+    ``github-users.json`` in the cache directory and are reused until older
+    than ``issue.GitHub.userttl`` seconds, defaults to one week.
+
+    Arguments:
+        :session: ``Session`` used to fetch user details.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        try:
+            self.ttl = int(get_config('issue.GitHub.userttl'))
+        except CalledProcessError:
+            self.ttl = 7 * 24 * 60 * 60
+        except ValueError:
+            raise GitIssueError(
+                'invalid issue.GitHub.userttl expected integer')
+        self.path = None
+        self.users = None
+        # Guards users, which are resolved from several threads at once.
+        self.lock = Lock()
+
+    def _load_(self):
+        # Must be called with the lock held.
+        if self.users is None:
+            self.path = join(get_cache_dir(), 'github-users.json')
+            self.users = {}
+            if exists(self.path):
+                try:
+                    with open(self.path, 'r') as users:
+                        self.users = load(users)
+                except ValueError:
+                    pass
+        return self.users
+
+    def _save_(self):
+        # Must be called with the lock held, each save writes a distinct
+        # temporary file so concurrent processes do not interfere.
+        fd, path = mkstemp(dir=get_cache_dir())
+        with fdopen(fd, 'w') as users:
+            dump(self.users, users)
+        rename(path, self.path)
+
+    def _fetch_(self, url):
+        response = self.session.get(url)
+        if response.status_code == 200:
+            return response.json()
+
+    def resolve(self, users):
+        """Fill in the name and email of users.
+
+        Details not in the directory, or which are stale, are fetched
+        concurrently before the directory is updated on disk.
+
+        Arguments:
+            :users: List of ``GitHubUser`` objects.
+        """
+        users = [user for user in users if not user.resolved]
+        if not users:
+            return
+        now = time()
+        stale = {}
+        with self.lock:
+            directory = self._load_()
+            for user in users:
+                key = str(user.id)
+                if key not in directory or \
+                        now - directory[key]['time'] > self.ttl:
+                    stale[key] = user.url
+        if stale:
+            # Details are fetched without holding the lock.
+            from concurrent.futures import ThreadPoolExecutor
+            keys = list(stale.keys())
+            with ThreadPoolExecutor(self.session.workers) as executor:
+                details = list(executor.map(self._fetch_,
+                                            [stale[key] for key in keys]))
+            with self.lock:
+                for key, detail in zip(keys, details):
+                    if detail:
+                        directory[key] = {
+                            'name': detail['name'],
+                            'email': detail['email'],
+                            'time': now,
+                        }
+                self._save_()
+        with self.lock:
+            for user in users:
+                detail = directory.get(str(user.id))
+                if detail:
+                    user.name = detail['name']
+                    user.email = detail['email']
+
 
 class GitHubIssue(Issue):
     """GitHub Issue implementation."""
 
-    def __init__(self, issue, auth, headers):
+    __slots__ = ('context', 'session', 'issue_url', 'comments_url',
+                 'events_url', 'html_url')
+
+    def __init__(self, issue, context):
         super().__init__(
             GitHubIssueNumber(issue),
             issue['title'],
@@ -169,38 +465,32 @@ class GitHubIssue(Issue):
             labels=[GitHubLabel(label) for label in issue['labels']],
             milestones=[GitHubMilestone(issue['milestone'])]
             if issue['milestone'] else [],
-            num_comments=issue['comments'])
-        self.auth = auth
-        self.headers = headers
+            num_comments=issue['comments'],
+            data=issue)
+        self.context = context
+        self.session = context.session
         self.issue_url = issue['url']
         self.comments_url = issue['comments_url']
         self.events_url = issue['events_url']
         self.html_url = issue['html_url']
 
     def comment(self, body):
-        response = post(
-            self.comments_url,
-            auth=self.auth,
-            headers=self.headers,
-            json={'body': body})
+        response = self.session.post(self.comments_url, json={'body': body})
         if response.status_code == 201:
+            self._forget_('comments')
             return GitHubIssueComment(response.json())
         else:
             raise GitIssueError(response)
 
     def comments(self):
-        response = get(self.comments_url, auth=self.auth, headers=self.headers)
-        if response.status_code == 200:
-            return [GitHubIssueComment(comment) for comment in response.json()]
-        else:
-            raise GitIssueError(response)
+        return [GitHubIssueComment(comment)
+                for comment in self._resource_('comments', lambda: get_all(
+                    self.session, self.comments_url, {'per_page': 100}))]
 
     def events(self):
-        response = get(self.events_url, auth=self.auth, headers=self.headers)
-        if response.status_code == 200:
-            return [GitHubIssueEvent(event) for event in response.json()]
-        else:
-            raise GitIssueError(response)
+        return [GitHubIssueEvent(event)
+                for event in self._resource_('events', lambda: get_all(
+                    self.session, self.events_url, {'per_page': 100}))]
 
     def edit(self, **kwargs):
         data = {}
@@ -236,10 +526,9 @@ class GitHubIssue(Issue):
                 data['labels'] = [label.name for label in labels]
         if len(data) == 0:
             raise GitIssueError('aborted edit due to no changes')
-        response = patch(
-            self.issue_url, auth=self.auth, headers=self.headers, json=data)
+        response = self.session.patch(self.issue_url, json=data)
         if response.status_code == 200:
-            return GitHubIssue(response.json(), self.auth, self.headers)
+            return GitHubIssue(response.json(), self.context)
         else:
             raise GitIssueError(response)
 
@@ -249,24 +538,16 @@ class GitHubIssue(Issue):
             if not isinstance(comment, basestring):
                 raise ValueError('comment must be a string')
             self.comment(comment)
-        response = patch(
-            self.issue_url,
-            auth=self.auth,
-            headers=self.headers,
-            json={'state': 'closed'})
+        response = self.session.patch(self.issue_url, json={'state': 'closed'})
         if response.status_code == 200:
-            return GitHubIssue(response.json(), self.auth, self.headers)
+            return GitHubIssue(response.json(), self.context)
         else:
             raise GitIssueError(response)
 
     def reopen(self):
-        response = patch(
-            self.issue_url,
-            auth=self.auth,
-            headers=self.headers,
-            json={'state': 'open'})
+        response = self.session.patch(self.issue_url, json={'state': 'open'})
         if response.status_code == 200:
-            return GitHubIssue(response.json(), self.auth, self.headers)
+            return GitHubIssue(response.json(), self.context)
         else:
             raise GitIssueError(response)
 
@@ -277,6 +558,8 @@ class GitHubIssue(Issue):
 class GitHubIssueNumber(IssueNumber):
     """GitHub IssueNumber implementation."""
 
+    __slots__ = ('number', 'id')
+
     def __init__(self, issue):
         super().__init__()
         self.number = issue['number']
@@ -292,6 +575,12 @@ class GitHubIssueNumber(IssueNumber):
 class GitHubIssueState(IssueState):
     """GitHub IssueState implementation."""
 
+    __slots__ = ()
+
+    @staticmethod
+    def _intern_key_(state):
+        return state
+
     def __init__(self, state):
         super().__init__(state, {'open': 'green',
                                  'closed': 'red',
@@ -301,6 +590,8 @@ class GitHubIssueState(IssueState):
 class GitHubIssueEvent(IssueEvent):
     """GitHub IssueEvent implementation."""
 
+    __slots__ = ()
+
     def __init__(self, event):
         desc = None
 
@@ -447,17 +738,22 @@ class GitHubIssueEvent(IssueEvent):
 class GitHubUser(User):
     """GitHub User implementation."""
 
+    __slots__ = ('id', 'url', 'resolved')
+
+    @staticmethod
+    def _intern_key_(user):
+        # Users stored by earlier versions include their email.
+        if user['id'] is not None:
+            return user['id'], 'email' in user
+
     def __init__(self, user):
-        # To avoid fetching the additional user (name, email) multiple times
-        # the results are cached.
+        # The email is not included in REST or GraphQL API user objects, the
+        # name only in the latter, they are filled in by GitHub.resolve() only
+        # when the user is to be displayed.
+        super().__init__(user['login'], user.get('email'), user.get('name'))
         self.id = user['id']
-        if self.id not in CACHE['users']:
-            response = get(user['url'])
-            if response.status_code == 200:
-                CACHE['users'][self.id] = response.json()
-        more = CACHE['users'][self.id] if self.id in CACHE['users'] else None
-        super().__init__(user['login'], more['email']
-                         if more else None, more['name'] if more else None)
+        self.url = user['url']
+        self.resolved = 'email' in user
 
     def __eq__(self, other):
         return self.id == other.id
@@ -469,6 +765,13 @@ class GitHubUser(User):
 class GitHubLabel(Label):
     """GitHub Label implementation."""
 
+    __slots__ = ('id', )
+
+    @staticmethod
+    def _intern_key_(label=None):
+        if label:
+            return label.get('id')
+
     def __init__(self, label=None):
         if not label:
             label = {'name': 'none', 'color': 'ffffff', 'id': 0}
@@ -486,8 +789,16 @@ class GitHubLabel(Label):
 class GitHubMilestone(Milestone):
     """GitHub Milestone implementation."""
 
+    __slots__ = ('number', 'id')
+
+    @staticmethod
+    def _intern_key_(milestone=None):
+        if milestone:
+            return milestone['id']
+
     def __init__(self, milestone=None):
         if not milestone:
+            import arrow
             milestone = {
                 'title': 'none',
                 'description': '',
@@ -511,6 +822,8 @@ class GitHubMilestone(Milestone):
 class GitHubIssueComment(IssueComment):
     """GitHub IssueComment implementation."""
 
+    __slots__ = ('html_url', )
+
     def __init__(self, comment):
         super().__init__(comment['body'], GitHubUser(comment['user']),
                          comment['created_at'], comment['id'])
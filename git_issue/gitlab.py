@@ -2,24 +2,181 @@
 
 from __future__ import print_function
 
-from builtins import str, super
-from re import findall
+from builtins import super
+from re import compile
+from subprocess import CalledProcessError
+from threading import Lock
+
+from git_issue import GitIssueError, get_config
+from git_issue.service import (Context, Issue, IssueComment, IssueEvent,
+                               IssueNumber, IssueState, Label, Milestone,
+                               Service, User, basestring, filter_issues,
+                               get_all, get_pages, get_protocol,
+                               get_repo_owner_name, get_resource,
+                               get_session, get_token)
+
+try:
+    from urllib.parse import quote_plus
+except ImportError:
+    from urllib import quote_plus
+
+# References to labels and milestones in the body of system notes.
+LABEL_REFERENCE = compile(r'~(\d+)')
+MILESTONE_REFERENCE = compile(r'%(\d+)')
+
+
+class GitLabRegistry(object):
+    """Index of a projects labels and milestones.
+
+    GitLab only includes the names of labels in issues and refers to labels
+    and milestones by ID in system notes. The registry requests all labels and
+    milestones once, only when they are first needed, and indexes them by
+    name, ID, and for milestones IID, until ``invalidate()`` is called. A
+    single registry is shared by all GitLab objects, see ``REGISTRY``.
+    """
 
-from arrow import utcnow
-from git_issue import GitIssueError
-from git_issue.service import (Issue, IssueComment, IssueEvent, IssueNumber,
-                               IssueState, Label, Milestone, Service, User,
-                               get_protocol, get_repo_owner_name, get_resource,
-                               get_token)
-from past.builtins import basestring
-from requests import get, post, put
-from requests.compat import quote_plus
-
-CACHE = {}
-
-
-def _headers_():
-    return {'Private-Token': get_token('GitLab')}
+    def __init__(self):
+        self.lock = Lock()
+        self.loading = Lock()
+        self.session = None
+        self.project_url = None
+        self._reset_()
+
+    def _reset_(self):
+        self.labels = {}
+        self.milestones = {'id': {}, 'iid': {}}
+        # Names of the indexes which hold all of the projects items.
+        self.complete = set()
+
+    def bind(self, session, project_url):
+        """Set the project to request labels and milestones from.
+
+        Arguments:
+            :session: ``Session`` used to make requests.
+            :project_url: API URL of the project.
+        """
+        with self.lock:
+            self.session = session
+            self.project_url = project_url
+            self._reset_()
+
+    def update(self, labels=None, milestones=None, complete=True):
+        """Index labels and/or milestones.
+
+        Keyword Arguments:
+            :labels: List of label ``dict`` objects.
+            :milestones: List of milestone ``dict`` objects.
+            :complete: When ``True`` the given items are all of the projects
+            and replace those indexed, otherwise they are added to those
+            indexed and all items are still requested when first needed.
+        """
+        # Indexes are replaced rather than modified so that readers never
+        # see a partially updated index.
+        with self.lock:
+            if labels is not None:
+                index = {} if complete else dict(self.labels)
+                for label in labels:
+                    label = GitLabLabel(label)
+                    index[label.name] = label
+                    index[label.id] = label
+                self.labels = index
+                if complete:
+                    self.complete.add('labels')
+            if milestones is not None:
+                index = {'id': {}, 'iid': {}} if complete else {
+                    'id': dict(self.milestones['id']),
+                    'iid': dict(self.milestones['iid']),
+                }
+                for milestone in milestones:
+                    milestone = GitLabMilestone(milestone)
+                    index['id'][milestone.id] = milestone
+                    index['iid'][milestone.iid] = milestone
+                self.milestones = index
+                if complete:
+                    self.complete.add('milestones')
+
+    def _load_(self, name):
+        with self.loading:
+            if name not in self.complete:
+                # Failures are not cached, they are requested again when next
+                # needed.
+                self.update(**{name: get_all(
+                    self.session, '%s/%s' % (self.project_url, name),
+                    {'per_page': 100})})
+        return getattr(self, name)
+
+    def invalidate(self):
+        """Discard the indexed labels and milestones.
+
+        They are requested again when next needed, so long running processes
+        see labels and milestones which have since changed.
+        """
+        with self.lock:
+            self._reset_()
+
+    def all_labels(self):
+        """Get all labels of the project.
+
+        Returns:
+            :list: Of ``GitLabLabel`` objects.
+
+        Raises:
+            :GitIssueError: If requesting the labels failed.
+        """
+        return [label for key, label in self._load_('labels').items()
+                if isinstance(key, basestring)]
+
+    def all_milestones(self):
+        """Get all milestones of the project.
+
+        Returns:
+            :list: Of ``GitLabMilestone`` objects.
+
+        Raises:
+            :GitIssueError: If requesting the milestones failed.
+        """
+        return list(self._load_('milestones')['id'].values())
+
+    def label(self, key):
+        """Get a label by name or ID.
+
+        Arguments:
+            :key: Name ``str`` or ID ``int`` of the label.
+
+        Returns:
+            :GitLabLabel: If the label exists.
+            :None: If the label does not exist or labels could not be
+            requested.
+        """
+        label = self.labels.get(key)
+        if label is None and 'labels' not in self.complete:
+            try:
+                label = self._load_('labels').get(key)
+            except GitIssueError:
+                pass
+        return label
+
+    def milestone(self, iid):
+        """Get a milestone by IID.
+
+        Arguments:
+            :iid: IID ``int`` of the milestone.
+
+        Returns:
+            :GitLabMilestone: If the milestone exists.
+            :None: If the milestone does not exist or milestones could not be
+            requested.
+        """
+        milestone = self.milestones['iid'].get(iid)
+        if milestone is None and 'milestones' not in self.complete:
+            try:
+                milestone = self._load_('milestones')['iid'].get(iid)
+            except GitIssueError:
+                pass
+        return milestone
+
+
+REGISTRY = GitLabRegistry()
 
 
 def _check_assignee_(assignee):
@@ -49,17 +206,107 @@ def _encode_state_(state):
     return {'open': 'opened', 'closed': 'closed', None: None}[state]
 
 
+def _gid_(gid):
+    # GraphQL global IDs, e.g. "gid://gitlab/Issue/1", end with the REST ID.
+    return int(gid.rsplit('/', 1)[-1])
+
+
+def _user_data_(user):
+    return {'id': _gid_(user['id']), 'username': user['username'],
+            'name': user['name']} if user else None
+
+
+def _milestone_data_(milestone):
+    return {
+        'id': _gid_(milestone['id']),
+        'iid': int(milestone['iid']),
+        'title': milestone['title'],
+        'description': milestone['description'],
+        'due_date': milestone['dueDate'],
+        'state': milestone['state'],
+    } if milestone else None
+
+
+def _note_data_(note):
+    return {
+        'id': _gid_(note['id']),
+        'body': note['body'],
+        'system': note['system'],
+        'author': _user_data_(note['author']),
+        'created_at': note['createdAt'],
+    }
+
+
+# Fields of a note page requested from the GraphQL API.
+NOTES_FIELDS = '''
+notes(first: 100, after: $cursor) {
+  pageInfo { hasNextPage endCursor }
+  nodes { id body system createdAt author { id username name } }
+}
+'''
+
+# Get an issue, its notes, and the labels and milestones which system notes
+# may refer to in a single request, projects with more labels or milestones
+# than fit in one page index the first page and request the rest when needed.
+ISSUE_QUERY = '''
+query($path: ID!, $iid: String!, $cursor: String) {
+  project(fullPath: $path) {
+    issue(iid: $iid) {
+      id iid title description state createdAt updatedAt userNotesCount
+      author { id username name }
+      assignees(first: 1) { nodes { id username name } }
+      labels(first: 100) { nodes { title } }
+      milestone { id iid title description dueDate state }
+      %s
+    }
+    labels(first: 100, includeAncestorGroups: true) {
+      pageInfo { hasNextPage }
+      nodes { id title color }
+    }
+    milestones(first: 100, includeAncestors: true) {
+      pageInfo { hasNextPage }
+      nodes { id iid title description dueDate state }
+    }
+  }
+}
+''' % NOTES_FIELDS
+
+# Get the remaining notes of an issue.
+NOTES_QUERY = '''
+query($path: ID!, $iid: String!, $cursor: String) {
+  project(fullPath: $path) {
+    issue(iid: $iid) {
+      %s
+    }
+  }
+}
+''' % NOTES_FIELDS
+
+
 class GitLab(Service):
     """GitLab Service implementation."""
 
     def __init__(self):
         super().__init__()
-        self.api_url = '%s://%s/api/v4' % (get_protocol('GitLab'),
-                                           get_resource('GitLab'))
-        self.project_url = '%s/projects/%s' % (
-            self.api_url, quote_plus(get_repo_owner_name('GitLab')))
+        url = '%s://%s' % (get_protocol('GitLab'), get_resource('GitLab'))
+        owner_name = get_repo_owner_name('GitLab')
+        self.api_url = '%s/api/v4' % url
+        self.project_url = '%s/projects/%s' % (self.api_url,
+                                               quote_plus(owner_name))
         self.issues_url = '%s/issues' % self.project_url
         self.users_url = '%s/users' % self.api_url
+        self.graphql_url = '%s/api/graphql' % url
+        self.owner_name = owner_name
+        self.session = get_session(
+            'GitLab', headers={'Private-Token': get_token('GitLab')})
+        self.context = Context(self.session, '%s/%s' % (url, owner_name),
+                               self.project_url)
+        REGISTRY.bind(self.session, self.project_url)
+        try:
+            self.graphql = get_config('issue.GitLab.graphql') in [
+                '1', 'true']
+        except CalledProcessError:
+            self.graphql = False
 
     def create(self, title, body, **kwargs):
         if not isinstance(title, basestring):
@@ -76,94 +323,148 @@ class GitLab(Service):
         milestone = _check_milestone_(kwargs.pop('milestone', None))
         if milestone:
             data['milestone_id'] = milestone.id
-        response = post(self.issues_url, headers=_headers_(), data=data)
+        response = self.session.post(self.issues_url, data=data)
         if response.status_code == 201:
-            return GitLabIssue(response.json(), self.issues_url)
+            return GitLabIssue(response.json(), self.context)
         else:
             raise GitIssueError(response)
 
     def issue(self, number):
-        try:
-            # GitLab returns a list of strings for labels, cache labels so we
-            # can get their color
-            CACHE['labels'] = self.labels()
-            CACHE['milestones'] = self.milestones()
-        except GitIssueError:
-            pass
-        response = get('%s/%s' % (self.issues_url, number),
-                       headers=_headers_())
+        if self.graphql:
+            return self._graphql_issue_(number)
+        response = self.session.get('%s/%s' % (self.issues_url, number))
         if response.status_code == 200:
-            return GitLabIssue(response.json(), self.issues_url)
+            return GitLabIssue(response.json(), self.context)
         else:
             raise GitIssueError(response)
 
-    def issues(self, state):
-        if state not in ['open', 'closed']:
+    def _query_(self, query, **variables):
+        variables['path'] = self.owner_name
+        response = self.session.post(self.graphql_url,
+                                     json={'query': query,
+                                           'variables': variables})
+        if response.status_code != 200:
+            raise GitIssueError(response)
+        result = response.json()
+        if result.get('errors'):
+            raise GitIssueError('\n'.join(
+                [error['message'] for error in result['errors']]))
+        return result['data']['project']
+
+    def _graphql_issue_(self, number):
+        iid = '%s' % number
+        project = self._query_(ISSUE_QUERY, iid=iid, cursor=None)
+        if not project or not project['issue']:
+            raise GitIssueError('issue not found')
+        labels = project['labels']
+        REGISTRY.update(
+            labels=[{'id': _gid_(label['id']), 'name': label['title'],
+                     'color': label['color']} for label in labels['nodes']],
+            complete=not labels['pageInfo']['hasNextPage'])
+        milestones = project['milestones']
+        REGISTRY.update(
+            milestones=[_milestone_data_(milestone)
+                        for milestone in milestones['nodes']],
+            complete=not milestones['pageInfo']['hasNextPage'])
+        node = project['issue']
+        notes = node['notes']['nodes']
+        page = node['notes']['pageInfo']
+        while page['hasNextPage']:
+            more = self._query_(NOTES_QUERY, iid=iid,
+                                cursor=page['endCursor'])['issue']['notes']
+            notes += more['nodes']
+            page = more['pageInfo']
+        assignees = node['assignees']['nodes']
+        issue = GitLabIssue({
+            'id': _gid_(node['id']),
+            'iid': int(node['iid']),
+            'title': node['title'],
+            'description': node['description'],
+            'state': node['state'],
+            'author': _user_data_(node['author']),
+            'created_at': node['createdAt'],
+            'updated_at': node['updatedAt'],
+            'assignee': _user_data_(assignees[0]) if assignees else None,
+            'labels': [label['title'] for label in node['labels']['nodes']],
+            'milestone': _milestone_data_(node['milestone']),
+            'user_notes_count': node['userNotesCount'],
+        }, self.context)
+        # The notes are already complete, seed the resource so comments and
+        # events do not request them again.
+        notes = [_note_data_(note) for note in notes]
+        issue._resource_('notes', lambda: notes)
+        return issue
+
+    def issues(self, state, since=None, **filters):
+        if state not in ['open', 'closed', 'all']:
             raise GitIssueError('invalid issue state: %s' % state)
-        issues = []
-        try:
-            # GitLab returns a list of strings for labels, cache labels so we
-            # can get their color
-            CACHE['labels'] = self.labels()
-        except GitIssueError:
-            pass
-        for state in {'open': ['open'],
-                      'closed': ['closed'],
-                      'all': ['open', 'closed']}[state]:
-            next_url = self.issues_url
-            while next_url:
-                response = get(next_url,
-                               headers=_headers_(),
-                               params={
-                                   'state': _encode_state_(state),
-                                   'scope': 'all',
-                                   'per_page': 100,
-                               })
-                if response.status_code == 200:
-                    issues += [GitLabIssue(issue, self.issues_url)
-                               for issue in response.json()]
-                    next_url = response.links['next'][
-                        'url'] if 'next' in response.links else None
-                else:
-                    raise GitIssueError(response)
-        return reversed(sorted(issues))
+        # Issues are streamed most recently created first, when state is not
+        # specified GitLab returns issues in all states.
+        params = {
+            'scope': 'all',
+            'per_page': 100,
+            'order_by': 'created_at',
+            'sort': 'desc',
+        }
+        if state != 'all':
+            params['state'] = _encode_state_(state)
+        if since:
+            params['updated_after'] = since
+        # labels (string) Comma separated label names, issues must have all
+        # of them.
+        labels = filters.pop('labels', None)
+        if labels:
+            params['labels'] = ','.join(labels)
+        # assignee_username and author_username avoid looking up user IDs.
+        assignee = filters.pop('assignee', None)
+        if assignee:
+            params['assignee_username'] = assignee
+        author = filters.pop('author', None)
+        if author:
+            params['author_username'] = author
+        # milestone (string) The milestone title.
+        milestone = filters.pop('milestone', None)
+        if milestone:
+            params['milestone'] = milestone
+        return filter_issues(self._issues_(params), **filters)
+
+    def _issues_(self, params):
+        for page in get_pages(self.session, self.issues_url, params):
+            for issue in page:
+                yield GitLabIssue(issue, self.context)
+
+    def load(self, data):
+        return GitLabIssue(data, self.context)
 
     def states(self):
         return [GitLabIssueState('open'), GitLabIssueState('closed'),
                 GitLabIssueState('all')]
 
     def user_search(self, keyword):
-        response = get(self.users_url,
-                       headers=_headers_(),
-                       params={'search': keyword})
+        response = self.session.get(self.users_url,
+                                    params={'search': keyword})
         if response.status_code == 200:
-            users = [GitLabUser(user) for user in response.json()]
-            if len(users) == 0:
-                raise GitIssueError('unable to find user: %s' % keyword)
-            return users
+            return [GitLabUser(user) for user in response.json()]
         else:
             raise GitIssueError(response)
 
     def labels(self):
-        response = get('%s/labels' % self.project_url, headers=_headers_())
-        if response.status_code == 200:
-            return [GitLabLabel(label) for label in response.json()]
-        else:
-            raise GitIssueError(response)
+        return REGISTRY.all_labels()
 
     def milestones(self):
-        response = get('%s/milestones' % self.project_url, headers=_headers_())
-        if response.status_code == 200:
-            return [GitLabMilestone(milestone)
-                    for milestone in response.json()]
-        else:
-            raise GitIssueError(response)
+        return REGISTRY.all_milestones()
+
+    def invalidate(self):
+        super().invalidate()
+        REGISTRY.invalidate()
 
 
 class GitLabIssue(Issue):
     """GitLab Issue implementation."""
 
-    def __init__(self, issue, url):
+    __slots__ = ('context', 'session', 'issue_url', 'notes_url')
+
+    def __init__(self, issue, context):
         super().__init__(
             GitLabIssueNumber(issue),
             issue['title'],
@@ -177,39 +478,36 @@ class GitLabIssue(Issue):
             labels=[GitLabLabel(label) for label in issue['labels']],
             milestones=[GitLabMilestone(issue['milestone'])]
             if issue['milestone'] else [],
-            num_comments=issue['user_notes_count'])
-        self.issue_url = '%s/%s' % (url, issue['iid'])
+            num_comments=issue['user_notes_count'],
+            data=issue)
+        self.context = context
+        self.session = context.session
+        self.issue_url = '%s/issues/%s' % (context.api_url, issue['iid'])
         self.notes_url = '%s/notes' % self.issue_url
 
     def comment(self, body):
-        response = post(
-            self.notes_url, headers=_headers_(), data={'body': body})
+        response = self.session.post(self.notes_url, data={'body': body})
         if response.status_code == 201:
-            return GitLabIssueComment(response.json(), self.number)
+            self._forget_('notes')
+            return GitLabIssueComment(response.json(), self.number,
+                                      self.context)
         else:
             raise GitIssueError(response)
 
+    def _notes_(self):
+        # NOTE: GitLab reports events as system notes, so comments and events
+        # share the same resource.
+        return self._resource_('notes', lambda: get_all(
+            self.session, self.notes_url,
+            {'per_page': 100, 'order_by': 'created_at', 'sort': 'asc'}))
+
     def comments(self):
-        comments = []
-        response = get(self.notes_url, headers=_headers_())
-        if response.status_code == 200:
-            for note in response.json():
-                if not note['system']:
-                    comments.append(GitLabIssueComment(note, self.number))
-        else:
-            raise GitIssueError(response)
-        return comments
+        return [GitLabIssueComment(note, self.number, self.context)
+                for note in self._notes_() if not note['system']]
 
     def events(self):
-        events = []
-        response = get(self.notes_url, headers=_headers_())
-        if response.status_code == 200:
-            for note in response.json():
-                if note['system']:
-                    events.append(GitLabIssueEvent(note))
-        else:
-            raise GitIssueError(response)
-        return events
+        return [GitLabIssueEvent(note)
+                for note in self._notes_() if note['system']]
 
     def edit(self, **kwargs):
         data = {}
@@ -234,12 +532,11 @@ class GitLabIssue(Issue):
         milestone = _check_milestone_(kwargs.pop('milestone', None))
         if milestone:
             data['milestone_id'] = milestone.id
-        response = put(self.issue_url, headers=_headers_(), data=data)
+        response = self.session.put(self.issue_url, data=data)
         if len(data) == 0:
             raise GitIssueError('aborted edit due to no changes')
         if response.status_code == 200:
-            return GitLabIssue(response.json(),
-                               self.issue_url[:self.issue_url.rfind('/')])
+            return GitLabIssue(response.json(), self.context)
         else:
             raise GitIssueError(response)
 
@@ -249,34 +546,30 @@ class GitLabIssue(Issue):
             if not isinstance(comment, basestring):
                 raise ValueError('command must be a string')
             self.comment(comment)
-        response = put(self.issue_url,
-                       headers=_headers_(),
-                       data={'state_event': 'close'})
+        response = self.session.put(self.issue_url,
+                                    data={'state_event': 'close'})
         if response.status_code == 200:
-            return GitLabIssue(response.json(),
-                               self.issue_url[:self.issue_url.rfind('/')])
+            return GitLabIssue(response.json(), self.context)
         else:
             raise GitIssueError(response)
 
     def reopen(self):
-        response = put(self.issue_url,
-                       headers=_headers_(),
-                       data={'state_event': 'reopen'})
+        response = self.session.put(self.issue_url,
+                                    data={'state_event': 'reopen'})
         if response.status_code == 200:
-            return GitLabIssue(response.json(),
-                               self.issue_url[:self.issue_url.rfind('/')])
+            return GitLabIssue(response.json(), self.context)
         else:
             raise GitIssueError(response)
 
     def url(self):
-        return '%s://%s/%s/issues/%s' % (
-            get_protocol('GitLab'), get_resource('GitLab'),
-            get_repo_owner_name('GitLab'), self.number.iid)
+        return '%s/issues/%s' % (self.context.url, self.number.iid)
 
 
 class GitLabIssueNumber(IssueNumber):
     """GitLab IssueNumber implementation."""
 
+    __slots__ = ('id', 'iid')
+
     def __init__(self, number):
         super().__init__()
         self.id = number['id']
@@ -292,6 +585,12 @@ class GitLabIssueNumber(IssueNumber):
 class GitLabIssueState(IssueState):
     """GitLab IssueState implementation."""
 
+    __slots__ = ()
+
+    @staticmethod
+    def _intern_key_(state):
+        return state
+
     def __init__(self, state):
         super().__init__(state, {
             'open': 'green',
@@ -304,20 +603,34 @@ class GitLabIssueState(IssueState):
 class GitLabIssueComment(IssueComment):
     """GitLab IssueComment implementation."""
 
-    def __init__(self, note, issue_id):
+    __slots__ = ('issue_id', 'context')
+
+    def __init__(self, note, issue_id, context):
         super().__init__(note['body'], GitLabUser(note['author']),
                          note['created_at'], note['id'])
         self.issue_id = issue_id
+        self.context = context
 
     def url(self):
-        return '%s://%s/%s/issues/%r#note_%s' % (
-            get_protocol('GitLab'), get_resource('GitLab'),
-            get_repo_owner_name('GitLab'), self.issue_id, self.id)
+        return '%s/issues/%r#note_%s' % (self.context.url, self.issue_id,
+                                         self.id)
+
+
+def _milestone_title_(match):
+    milestone = REGISTRY.milestone(int(match.group(1)))
+    return milestone.title if milestone else match.group(0)
+
+
+def _label_name_(match):
+    label = REGISTRY.label(int(match.group(1)))
+    return '%s' % label if label else match.group(0)
 
 
 class GitLabIssueEvent(IssueEvent):
     """GitLab IssueEvent implementation."""
 
+    __slots__ = ()
+
     def __init__(self, event):
         body = event['body']
 
@@ -333,23 +646,10 @@ class GitLabIssueEvent(IssueEvent):
             body = body.replace(' **', ' %(white)s').replace('**', '%(reset)s')
 
         if 'milestone' in body:
-            # Replace %\d with milestone
-            milestone_ids = findall(r'%\d+', body)
-            if 'milestones' in CACHE:
-                for milestone_id in milestone_ids:
-                    iid = milestone_id[1:]
-                    for milestone in CACHE['milestones']:
-                        if str(milestone.iid) == iid:
-                            body = body.replace(milestone_id, milestone.title)
+            body = MILESTONE_REFERENCE.sub(_milestone_title_, body)
 
         if 'label' in body:
-            label_iids = findall(r'~\d+', body)
-            if 'labels' in CACHE:
-                for label_iid in label_iids:
-                    iid = label_iid[1:]
-                    for label in CACHE['labels']:
-                        if str(label.id) == iid:
-                            body = body.replace(label_iid, '%s' % label)
+            body = LABEL_REFERENCE.sub(_label_name_, body)
 
         # TODO: Other events?
 
@@ -364,6 +664,12 @@ class GitLabIssueEvent(IssueEvent):
 class GitLabUser(User):
     """GitLab User implementation."""
 
+    __slots__ = ('id', )
+
+    @staticmethod
+    def _intern_key_(user):
+        return user['id']
+
     def __init__(self, user):
         super().__init__(user['username'], None, user['name'])
         self.id = user['id']
@@ -372,39 +678,64 @@ class GitLabUser(User):
 class GitLabLabel(Label):
     """GitLab Label implementation."""
 
+    __slots__ = ('id', 'resolved', '_color')
+
+    @staticmethod
+    def _intern_key_(label=None):
+        # Labels of issues are names, labels from the API have IDs.
+        if isinstance(label, basestring):
+            return label
+        if label:
+            return label['id']
+
     def __init__(self, label=None):
+        self.resolved = True
         if not label:
-            name = 'none'
-            color = 'ffffff'
+            super().__init__('none', 'ffffff')
             self.id = None
+        elif isinstance(label, basestring):
+            # GitLab returns a list of strings for labels, the color is looked
+            # up in the registry when it is first used.
+            super().__init__(label, 'ffffff')
+            self.id = None
+            self.resolved = False
         else:
-            if isinstance(label, basestring):
-                # GitLab returns a list of strings for labels, cache labels so
-                # we can get their color
-                name = label
-                if 'labels' in CACHE:
-                    for l in CACHE['labels']:
-                        if l.name == label:
-                            color = '%02x%02x%02x' % l.color
-                else:
-                    color = 'ffffff'
-            else:
-                name = label['name']
-                color = label['color'].replace('#', '')
-                self.id = label['id']
-        super().__init__(name, color)
+            super().__init__(label['name'], label['color'].replace('#', ''))
+            self.id = label['id']
+
+    @property
+    def color(self):
+        if not self.resolved:
+            self.resolved = True
+            label = REGISTRY.label(self.name)
+            if label:
+                self._color = label.color
+        return self._color
+
+    @color.setter
+    def color(self, color):
+        self._color = color
 
 
 class GitLabMilestone(Milestone):
     """GitLab Milestone implementation."""
 
+    __slots__ = ('id', 'iid')
+
+    @staticmethod
+    def _intern_key_(milestone=None):
+        if milestone:
+            return milestone['id']
+
     def __init__(self, milestone=None):
         if not milestone:
+            from arrow import utcnow
             milestone = {'title': 'none',
                          'description': '',
                          'due_date': '%s' % utcnow(),
                          'state': 'closed',
-                         'id': 0}
+                         'id': 0,
+                         'iid': 0}
         super().__init__(milestone['title'], milestone['description'],
                          milestone['due_date'], milestone['state'])
         self.id = milestone['id']
@@ -3,16 +3,16 @@
 from __future__ import print_function
 
 from builtins import super
+from heapq import merge
 from warnings import warn
 
-from arrow import utcnow
 from git_issue import GitIssueError
-from git_issue.service import (Issue, IssueComment, IssueEvent, IssueNumber,
-                               IssueState, Label, Milestone, Service, User,
-                               get_protocol, get_repo_owner_name, get_resource,
-                               get_token)
-from past.builtins import basestring
-from requests import delete, get, patch, post, put
+from git_issue.service import (Context, Issue, IssueComment, IssueEvent,
+                               IssueNumber, IssueState, Label, Milestone,
+                               Service, User, basestring, filter_issues,
+                               get_all, get_pages, get_protocol,
+                               get_repo_owner_name, get_resource,
+                               get_session, get_token, parse_date)
 
 
 def _check_assignee_(assignee):
@@ -45,11 +45,14 @@ class Gogs(Service):
 
     def __init__(self):
         super().__init__()
+        owner_name = get_repo_owner_name('Gogs')
         self.url = '%s://%s' % (get_protocol('Gogs'), get_resource('Gogs'))
         self.api_url = '%s/api/v1' % self.url
-        self.repos_url = '%s/repos/%s' % (self.api_url,
-                                          get_repo_owner_name('Gogs'))
-        self.header = {'Authorization': 'token %s' % get_token('Gogs')}
+        self.repos_url = '%s/repos/%s' % (self.api_url, owner_name)
+        self.session = get_session(
+            'Gogs', headers={'Authorization': 'token %s' % get_token('Gogs')})
+        self.context = Context(self.session, '%s/%s' % (self.url, owner_name),
+                               self.repos_url)
 
     def create(self, title, body, **kwargs):
         # title (string) The title of the issue
@@ -72,55 +75,55 @@ class Gogs(Service):
         milestone = _check_milestone_(kwargs.pop('milestone', None))
         if milestone:
             data['milestone'] = milestone.id
-        response = post(
-            '%s/issues' % self.repos_url, json=data, headers=self.header)
+        response = self.session.post('%s/issues' % self.repos_url, json=data)
         if response.status_code == 201:
-            return GogsIssue(response.json(), self.repos_url, self.header)
+            return GogsIssue(response.json(), self.context)
         else:
             raise GitIssueError(response)
 
     def issue(self, number):
-        response = get('%s/issues/%s' % (self.repos_url, number),
-                       headers=self.header)
+        response = self.session.get('%s/issues/%s' % (self.repos_url, number))
         if response.status_code == 200:
-            return GogsIssue(response.json(), self.repos_url, self.header)
+            return GogsIssue(response.json(), self.context)
         else:
             raise GitIssueError(response)
 
-    def issues(self, state):
+    def issues(self, state, since=None, **filters):
         # Parameters are not documented, this is from the Gogs issue page URL.
         #   ?type=all&sort=&state=closed&labels=0&milestone=0&assignee=0
-        # state seems to be the only one which works for api/v1.
+        # state seems to be the only one which works for api/v1, so all other
+        # filters are applied here.
         if state not in ['open', 'closed', 'all']:
             raise GitIssueError(
                 'state must be one of "open", "closed", or "all"')
-        issues = []
-        # Gogs does't not support 'all' so we must iterate over 'open' and
-        # 'closed' states to get all issues.
-        for state in {'open': ['open'],
-                      'closed': ['closed'],
-                      'all': ['open', 'closed']}[state]:
-            next_url = '%s/issues' % self.repos_url
-            while next_url:
-                response = get(next_url,
-                               headers=self.header,
-                               params={'state': state})
-                if response.status_code == 200:
-                    issues += [GogsIssue(issue, self.repos_url, self.header)
-                               for issue in response.json()]
-                    # If a link to the next page of issues present, use it.
-                    next_url = response.links['next'][
-                        'url'] if 'next' in response.links else None
-                else:
-                    raise GitIssueError(response)
-        return reversed(sorted(issues))
+        if state == 'all':
+            # Gogs does't not support 'all' so we must merge the 'open' and
+            # 'closed' issues, both are ordered most recently created first.
+            return filter_issues(merge(self._issues_('open', since),
+                                       self._issues_('closed', since),
+                                       reverse=True), **filters)
+        return filter_issues(self._issues_(state, since), **filters)
+
+    def _issues_(self, state, since):
+        # Gogs encodes dates with a local offset, compare them as dates.
+        since = parse_date(since) if since else None
+        for page in get_pages(self.session, '%s/issues' % self.repos_url,
+                              {'state': state}):
+            for issue in page:
+                # NOTE: Gogs does not support filtering by update date so all
+                # issues are fetched and filtered here.
+                if not since or parse_date(issue['updated_at']) >= since:
+                    yield GogsIssue(issue, self.context)
+
+    def load(self, data):
+        return GogsIssue(data, self.context)
 
     def states(self):
         return [GogsIssueState('open'), GogsIssueState('closed'),
                 GogsIssueState('all')]
 
     def labels(self):
-        response = get('%s/labels' % self.repos_url, headers=self.header)
+        response = self.session.get('%s/labels' % self.repos_url)
         if response.status_code == 200:
             labels = [GogsLabel(label) for label in response.json()]
         else:
@@ -128,7 +131,7 @@ class Gogs(Service):
         return labels
 
     def milestones(self):
-        response = get('%s/milestones' % self.repos_url, headers=self.header)
+        response = self.session.get('%s/milestones' % self.repos_url)
         if response.status_code == 200:
             milestones = [GogsMilestone(milestone)
                           for milestone in response.json()]
@@ -137,22 +140,21 @@ class Gogs(Service):
         return milestones
 
     def user_search(self, keyword):
-        response = get('%s/users/search' % self.api_url,
-                       headers=self.header,
-                       params={'q': keyword})
+        response = self.session.get('%s/users/search' % self.api_url,
+                                    params={'q': keyword})
         if response.status_code == 200:
             users = response.json()['data']
         else:
             raise GitIssueError(response)
-        if len(users) == 0:
-            raise GitIssueError('unable to find user: %s' % keyword)
         return [GogsUser(user) for user in users]
 
 
 class GogsIssue(Issue):
     """Gogs Issue implementation."""
 
-    def __init__(self, issue, repos_url, header):
+    __slots__ = ('context', 'session', 'issues_url', 'issue_url')
+
+    def __init__(self, issue, context):
         super().__init__(
             GogsIssueNumber(issue),
             issue['title'],
@@ -166,58 +168,49 @@ class GogsIssue(Issue):
             labels=[GogsLabel(label) for label in issue['labels']],
             milestones=[GogsMilestone(issue['milestone'])]
             if issue['milestone'] else [],
-            num_comments=issue['comments'])
-        self.repos_url = repos_url
-        self.issues_url = '%s/issues' % self.repos_url
+            num_comments=issue['comments'],
+            data=issue)
+        self.context = context
+        self.session = context.session
+        self.issues_url = '%s/issues' % context.api_url
         self.issue_url = '%s/%r' % (self.issues_url, self.number)
-        self.header = header
-        self.cache = {}
 
     def comment(self, body):
-        response = post(
+        response = self.session.post(
             '%s/%r/comments' % (self.issues_url, self.number),
-            headers=self.header,
             json={'body': body})
         if response.status_code == 201:
-            return GogsIssueComment(response.json(), self.number)
+            self._forget_('comments')
+            return GogsIssueComment(response.json(), self.number,
+                                    self.context)
         else:
             raise GitIssueError(response)
 
     def _comments_(self):
-        response = get('%s/%r/comments' % (self.issues_url, self.number),
-                       headers=self.header)
-        if response.status_code == 200:
-            self.cache['comments'] = response.json()
-        else:
-            raise GitIssueError(response)
+        # NOTE: Gogs reports events as comments with an empty body, so comments
+        # and events share the same resource.
+        return self._resource_('comments', lambda: get_all(
+            self.session, '%s/%r/comments' % (self.issues_url, self.number)))
 
     def comments(self):
-        # NOTE: Gogs reports events as comments with an empty body, so we cache
-        # the data instead of getting it twice.
-        if 'comments' not in self.cache:
-            self._comments_()
-        comments = []
-        for comment in self.cache['comments']:
-            if len(comment['body']) > 0:
-                comments.append(GogsIssueComment(comment, self.number))
-        return comments
+        return [GogsIssueComment(comment, self.number, self.context)
+                for comment in self._comments_() if len(comment['body']) > 0]
 
     def events(self):
-        # NOTE: Gogs reports events as comments with an empty body, so we cache
-        # the data instead of getting it twice.
-        if 'comments' not in self.cache:
-            self._comments_()
         # NOTE: Gogs issues can begin in a closed state so to correctly
         # determine the state change for each action we must work from issues
         # current state.
-        state = self.state
+        state = self.state.name
         events = []
-        for event in reversed(sorted(self.cache['comments'])):
+        for event in sorted(self._comments_(),
+                            key=lambda comment: comment['created_at'],
+                            reverse=True):
             if len(event['body']) == 0:
                 events.append(
                     GogsIssueEvent({'open': 'reopened',
                                     'closed': 'closed'}[state], event))
                 state = {'open': 'closed', 'closed': 'open'}[state]
+        events.reverse()
         return events
 
     def edit(self, **kwargs):
@@ -259,23 +252,20 @@ class GogsIssue(Issue):
             labels = data.pop('labels')
             if len(labels) == 0:
                 # "none" was found in labels, delete all labels for the issue.
-                response = delete(
-                    '%s/labels' % self.issue_url, headers=self.header)
+                response = self.session.delete('%s/labels' % self.issue_url)
                 if response.status_code != 204:
                     raise GitIssueError(response)
             else:
                 # Replace all labels.
-                response = put('%s/labels' % self.issue_url,
-                               headers=self.header,
-                               json={'labels': labels})
+                response = self.session.put('%s/labels' % self.issue_url,
+                                            json={'labels': labels})
                 if response.status_code != 200:
                     raise GitIssueError(response)
-        response = patch(
+        response = self.session.patch(
             '%s/%r' % (self.issues_url, self.number),
-            headers=self.header,
             json=data)
         if response.status_code == 201:
-            return GogsIssue(response.json(), self.repos_url, self.header)
+            return GogsIssue(response.json(), self.context)
         else:
             raise GitIssueError(response)
 
@@ -285,34 +275,32 @@ class GogsIssue(Issue):
             if not isinstance(comment, basestring):
                 raise ValueError('comment must be a string')
             self.comment(comment)
-        response = patch(
+        response = self.session.patch(
             '%s/%r' % (self.issues_url, self.number),
-            headers=self.header,
             json={'state': 'closed'})
         if response.status_code == 201:
-            return GogsIssue(response.json(), self.repos_url, self.header)
+            return GogsIssue(response.json(), self.context)
         else:
             raise GitIssueError(response)
 
     def reopen(self):
-        response = patch(
+        response = self.session.patch(
             '%s/%r' % (self.issues_url, self.number),
-            headers=self.header,
             json={'state': 'open'})
         if response.status_code == 201:
-            return GogsIssue(response.json(), self.repos_url, self.header)
+            return GogsIssue(response.json(), self.context)
         else:
             raise GitIssueError(response)
 
     def url(self):
-        return '%s://%s/%s/issues/%r' % (
-            get_protocol('Gogs'), get_resource('Gogs'),
-            get_repo_owner_name('Gogs'), self.number)
+        return '%s/issues/%r' % (self.context.url, self.number)
 
 
 class GogsIssueNumber(IssueNumber):
     """Gogs IssueNumber implementation."""
 
+    __slots__ = ('number', 'id')
+
     def __init__(self, issue):
         super().__init__()
         self.number = issue['number']
@@ -328,6 +316,12 @@ class GogsIssueNumber(IssueNumber):
 class GogsIssueState(IssueState):
     """Gogs IssueState implementation."""
 
+    __slots__ = ()
+
+    @staticmethod
+    def _intern_key_(state):
+        return state
+
     def __init__(self, state):
         super().__init__(state, {'closed': 'red',
                                  'open': 'green',
@@ -337,20 +331,24 @@ class GogsIssueState(IssueState):
 class GogsIssueComment(IssueComment):
     """Gogs IssueComment implementation."""
 
-    def __init__(self, comment, issue_number):
+    __slots__ = ('issue_number', 'context')
+
+    def __init__(self, comment, issue_number, context):
         super().__init__(comment['body'], GogsUser(comment['user']),
                          comment['created_at'], comment['id'])
         self.issue_number = issue_number
+        self.context = context
 
     def url(self):
-        return '%s://%s/%s/issues/%r/#issuecomment-%s' % (
-            get_protocol('Gogs'), get_resource('Gogs'),
-            get_repo_owner_name('Gogs'), self.issue_number, self.id)
+        return '%s/issues/%r/#issuecomment-%s' % (
+            self.context.url, self.issue_number, self.id)
 
 
 class GogsIssueEvent(IssueEvent):
     """Gogs IssueEvent implementation."""
 
+    __slots__ = ()
+
     def __init__(self, action, event):
         super().__init__('%({})s{}%(reset)s'.format({'reopened': 'green',
                                                      'closed': 'red'}[action],
@@ -361,6 +359,12 @@ class GogsIssueEvent(IssueEvent):
 class GogsUser(User):
     """Gogs User implementation."""
 
+    __slots__ = ('id', )
+
+    @staticmethod
+    def _intern_key_(user):
+        return user['id']
+
     def __init__(self, user):
         super().__init__(user['username'], user['email'], user['full_name'])
         self.id = user['id']
@@ -375,6 +379,13 @@ class GogsUser(User):
 class GogsLabel(Label):
     """Gogs Label implementation."""
 
+    __slots__ = ('id', )
+
+    @staticmethod
+    def _intern_key_(label=None):
+        if label:
+            return label['id']
+
     def __init__(self, label=None):
         if not label:
             label = {'name': 'none', 'color': 'ffffff', 'id': 0}
@@ -391,8 +402,16 @@ class GogsLabel(Label):
 class GogsMilestone(Milestone):
     """Gogs Milestone implementation."""
 
+    __slots__ = ('id', )
+
+    @staticmethod
+    def _intern_key_(milestone=None):
+        if milestone:
+            return milestone['id']
+
     def __init__(self, milestone=None):
         if not milestone:
+            from arrow import utcnow
             milestone = {'title': 'none',
                          'description': '',
                          'due_on': '%s' % utcnow(),
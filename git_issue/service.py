@@ -3,15 +3,51 @@
 from __future__ import print_function
 
 from abc import ABCMeta, abstractmethod
-from collections import namedtuple
+from collections import deque, namedtuple
+from datetime import datetime
+from heapq import merge
+from itertools import islice
 from subprocess import CalledProcessError
+from sys import version_info
+from threading import Lock
 
-import arrow
-from future.utils import with_metaclass
-from giturlparse import parse
-from past.builtins import basestring
+from git_issue import CONTEXT, GitIssueError, get_config, is_tty
 
-from git_issue import GitIssueError, get_config
+try:
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from urlparse import parse_qs, urlparse
+
+# NOTE: The command line interface imports this module for every command,
+# including shell completion, so modules which are slow to import, such as
+# requests and arrow, are only imported when they are used.
+
+if version_info[0] < 3:
+    from past.builtins import basestring
+else:
+    # Importing future and past takes longer than the rest of the command
+    # line interface, they are only required on Python 2.
+    basestring = str
+
+
+def with_metaclass(meta, *bases):
+    """Create a base class which creates classes using a metaclass.
+
+    Equivalent to ``future.utils.with_metaclass``, without importing it.
+
+    Arguments:
+        :meta: Metaclass of the classes to create.
+        :bases: Base classes of the classes to create.
+
+    Returns:
+        :type: Temporary class to inherit from, it replaces itself with
+        ``bases`` when a class inheriting from it is created.
+    """
+    class metaclass(meta):
+        def __new__(cls, name, this_bases, namespace):
+            return meta(name, bases, namespace)
+
+    return type.__new__(metaclass, 'temporary_class', (), {})
 
 
 def get_url(name):
@@ -47,7 +83,7 @@ def get_protocol(name):
     url = get_url(name)
     if url:
         _check_service_url_(name, url)
-        return parse(url).protocol
+        return _parse_url_(url).protocol
     try:
         use_https = get_config('issue.%s.https' % name)
         if use_https == '0' or use_https == 'false':
@@ -70,6 +106,11 @@ def get_remote(name):
     return remote
 
 
+def _parse_url_(url):
+    from giturlparse import parse
+    return parse(url)
+
+
 def _check_service_url_(name, url):
     if not url.endswith('.git'):
         raise GitIssueError('invalid issue.%s.url expected ".git" suffix: %s' %
@@ -95,7 +136,7 @@ def get_resource(name):
             raise GitIssueError(
                 'failed to determine service HTTP URL, specify using:\n'
                 'git config issue.%s.url <url>' % name)
-    return parse(url).resource
+    return _parse_url_(url).resource
 
 
 def get_repo_owner_name(name):
@@ -114,7 +155,7 @@ def get_repo_owner_name(name):
             raise GitIssueError(
                 'failed to determine repository HTTP URL, specify using:\n'
                 'git config issue.%s.url <url>' % name)
-    remote = parse(url)
+    remote = _parse_url_(url)
     return '%s/%s' % (remote.owner, remote.name)
 
 
@@ -132,6 +173,393 @@ def get_token(name):
     return token
 
 
+def get_session(name, auth=None, headers=None):
+    """Get a pooled HTTP session for the service.
+
+    The session keeps connections alive between requests so that issue pages,
+    comments, events, and users reuse the same TCP and TLS connection. The size
+    of the connection pool is read from ``issue.<service>.poolsize``, defaults
+    to ``10``. Unless ``issue.<service>.httpcache`` is ``0`` or ``false``
+    responses are cached and revalidated using conditional requests. The
+    maximum number of concurrent requests is available as ``workers``.
+
+    Requests time out after ``issue.<service>.timeout`` seconds, see
+    ``get_timeout()``. ``GET`` requests which fail with a connection error or
+    a ``5xx`` status are retried up to ``issue.<service>.retries`` times,
+    defaults to ``3``, with exponential backoff. When
+    ``issue.<service>.hedge`` is set to a number of seconds, a second copy of
+    a ``GET`` which has not completed by then is sent and whichever completes
+    first is used.
+
+    The session is created when it is first used, commands which make no
+    requests do not pay the cost of importing ``requests``.
+
+    Arguments:
+        :name: Name of the service.
+
+    Keyword Arguments:
+        :auth: Authentication for all requests, e.g. a ``(username,
+        password)`` tuple (optional).
+        :headers: ``dict`` of headers to send with all requests (optional).
+
+    Returns:
+        :LazySession: Proxy to the ``requests.Session`` to use for all service
+        requests.
+    """
+    return LazySession(lambda: _create_session_(name, auth, headers))
+
+
+def _create_session_(name, auth, headers):
+    from requests.adapters import HTTPAdapter
+    from git_issue.session import Session, get_retry
+    try:
+        size = int(get_config('issue.%s.poolsize' % name))
+    except CalledProcessError:
+        size = 10
+    except ValueError:
+        raise GitIssueError('invalid issue.%s.poolsize expected integer' %
+                            name)
+    try:
+        cache = get_config('issue.%s.httpcache' % name) not in ['0', 'false']
+    except CalledProcessError:
+        cache = True
+    try:
+        retries = int(get_config('issue.%s.retries' % name))
+    except CalledProcessError:
+        retries = 3
+    except ValueError:
+        raise GitIssueError('invalid issue.%s.retries expected integer' %
+                            name)
+    try:
+        hedge = float(get_config('issue.%s.hedge' % name))
+    except CalledProcessError:
+        hedge = None
+    except ValueError:
+        raise GitIssueError('invalid issue.%s.hedge expected seconds' % name)
+    adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size,
+                          max_retries=get_retry(max(retries, 0)))
+    session = Session(cache, get_workers(name), timeout=get_timeout(name),
+                      hedge=hedge)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.auth = auth
+    session.headers.update(headers or {})
+    return session
+
+
+class LazySession(object):
+    """Proxy which creates a session when any of its attributes are used.
+
+    Arguments:
+        :create: Callable returning the session.
+    """
+
+    def __init__(self, create):
+        self._create_ = create
+        self._session_ = None
+        self._lock_ = Lock()
+
+    def __getattr__(self, name):
+        if self._session_ is None:
+            with self._lock_:
+                if self._session_ is None:
+                    self._session_ = self._create_()
+        return getattr(self._session_, name)
+
+
+def get_timeout(name):
+    """Get the connect and read timeouts for the service.
+
+    Read from ``issue.<service>.timeout`` as either ``<seconds>`` for both or
+    ``<connect>,<read>``, defaults to ``10,60``.
+
+    Arguments:
+        :name: Name of the service.
+
+    Returns:
+        :tuple: Of connect and read timeouts in seconds.
+    """
+    try:
+        timeout = get_config('issue.%s.timeout' % name)
+    except CalledProcessError:
+        return (10.0, 60.0)
+    try:
+        timeouts = [float(seconds) for seconds in timeout.split(',')]
+    except ValueError:
+        timeouts = []
+    if len(timeouts) == 1:
+        timeouts *= 2
+    if len(timeouts) != 2:
+        raise GitIssueError('invalid issue.%s.timeout expected seconds or '
+                            'connect,read seconds' % name)
+    return tuple(timeouts)
+
+
+def get_workers(name):
+    """Get the maximum number of concurrent requests for the service.
+
+    Read from ``issue.<service>.workers``, defaults to ``8``.
+
+    Arguments:
+        :name: Name of the service.
+    """
+    try:
+        workers = int(get_config('issue.%s.workers' % name))
+    except CalledProcessError:
+        workers = 8
+    except ValueError:
+        raise GitIssueError('invalid issue.%s.workers expected integer' %
+                            name)
+    return max(workers, 1)
+
+
+def _page_count_(response):
+    # GitLab reports the number of pages in a header, GitHub provides a link to
+    # the last page, neither are available for Gogs.
+    try:
+        return int(response.headers['X-Total-Pages'])
+    except (KeyError, ValueError):
+        pass
+    if 'last' in response.links:
+        query = parse_qs(urlparse(response.links['last']['url']).query)
+        if 'page' in query:
+            return int(query['page'][0])
+
+
+def get_all(session, url, params=None):
+    """Get all items of a paginated resource.
+
+    Arguments:
+        :session: ``Session`` used to make requests.
+        :url: URL of the first page.
+        :params: ``dict`` of query parameters (optional).
+
+    Returns:
+        :list: Of decoded JSON items from all pages, in order.
+
+    Raises:
+        :GitIssueError: If any page request was unsuccessful.
+    """
+    return [item for page in get_pages(session, url, params) for item in page]
+
+
+def get_pages(session, url, params=None):
+    """Get all pages of a paginated resource.
+
+    The first page is requested to determine the total number of pages, when
+    it is known the remaining pages are requested concurrently, otherwise the
+    link to the next page is followed one page at a time. At most
+    ``session.workers`` pages are requested ahead of the page most recently
+    yielded so closing the generator early does not request the remaining
+    pages.
+
+    Arguments:
+        :session: ``Session`` used to make requests.
+        :url: URL of the first page.
+        :params: ``dict`` of query parameters (optional).
+
+    Yields:
+        Decoded JSON of each page, in page order.
+
+    Raises:
+        :GitIssueError: If any page request was unsuccessful.
+    """
+    def _get_(url, params):
+        response = session.get(url, params=params)
+        if response.status_code != 200:
+            raise GitIssueError(response)
+        return response
+
+    response = _get_(url, params)
+    yield response.json()
+    count = _page_count_(response)
+    if count is None:
+        while 'next' in response.links:
+            # The link already contains the query parameters.
+            response = _get_(response.links['next']['url'], None)
+            yield response.json()
+        return
+    pages = iter([dict(params or {}, page=page)
+                  for page in range(2, count + 1)])
+    futures = deque()
+    from concurrent.futures import ThreadPoolExecutor
+    executor = ThreadPoolExecutor(session.workers)
+    try:
+        for page in islice(pages, session.workers):
+            futures.append(executor.submit(_get_, url, page))
+        while futures:
+            response = futures.popleft().result()
+            for page in islice(pages, 1):
+                futures.append(executor.submit(_get_, url, page))
+            yield response.json()
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def parse_date(date):
+    """Parse a service encoded date.
+
+    ISO 8601 dates are parsed using ``datetime.fromisoformat`` when it is
+    available, ``arrow`` is used for everything else.
+
+    Arguments:
+        :date: UTC encoded date string.
+
+    Returns:
+        :datetime: Timezone aware date.
+    """
+    try:
+        return datetime.fromisoformat(date.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        import arrow
+        return arrow.get(date).datetime
+
+
+def filter_issues(issues, since=None, labels=None, assignee=None,
+                  author=None, milestone=None):
+    """Filter issues on the client.
+
+    Used for the filters of ``Service.issues()`` which a service can not
+    express in its requests and for issues from the local store.
+
+    Arguments:
+        :issues: Iterable of ``Issue`` objects.
+
+    Keyword Arguments:
+        The filters of ``Service.issues()``, filters which are not given
+        match every issue.
+
+    Yields:
+        Each ``Issue`` which matches all of the filters, in order.
+    """
+    since = parse_date(since) if since else None
+    for issue in issues:
+        if labels and not set(labels) <= set(
+                [label.name for label in issue.labels]):
+            continue
+        if assignee and (not issue.assignee or
+                         issue.assignee.username != assignee):
+            continue
+        if author and issue.author.username != author:
+            continue
+        if milestone and milestone not in [
+                issue_milestone.title
+                for issue_milestone in issue.milestones or []]:
+            continue
+        if since and parse_date(issue.updated or issue.created_at) < since:
+            continue
+        yield issue
+
+
+class Dated(object):
+    """Mixin for objects with a creation date.
+
+    The service encoded date is kept as given and only parsed when first used,
+    objects are ordered by ``created_key`` which avoids constructing ``arrow``
+    objects when sorting.
+    """
+
+    __slots__ = ('created_at', '_created_key', '_created')
+
+    def _set_created_(self, created):
+        if CONTEXT.get('debug'):
+            if not created or not isinstance(created, basestring):
+                raise ValueError('created must be a string')
+        self.created_at = created
+        self._created_key = None
+        self._created = None
+
+    @property
+    def created_key(self):
+        """Sortable creation date, a timezone aware ``datetime``."""
+        if self._created_key is None:
+            self._created_key = parse_date(self.created_at)
+        return self._created_key
+
+    @property
+    def created(self):
+        """Creation date, an ``arrow.Arrow``."""
+        if self._created is None:
+            from arrow import Arrow
+            self._created = Arrow.fromdatetime(self.created_key)
+        return self._created
+
+    def __lt__(self, other):
+        return self.created_key < other.created_key
+
+
+# Every class using the Interned metaclass, see clear_interned().
+INTERNED = []
+
+
+class Interned(ABCMeta):
+    """Metaclass which shares instances constructed from the same data.
+
+    Classes using this metaclass may implement the static method
+    ``_intern_key_``, taking the same arguments as the constructor, which
+    returns a hashable key identifying the instance to construct, e.g. the ID
+    of a user. When a key is returned the first instance constructed for that
+    key is returned by all later constructions until ``clear_interned()`` is
+    called, otherwise a new instance is constructed. Shared instances must not
+    be modified after construction other than to fill in details which are
+    resolved lazily.
+    """
+
+    def __init__(cls, name, bases, namespace):
+        ABCMeta.__init__(cls, name, bases, namespace)
+        cls._interned_ = {}
+        INTERNED.append(cls)
+
+    def __call__(cls, *args, **kwargs):
+        key = cls._intern_key_(*args, **kwargs)
+        if key is None:
+            return ABCMeta.__call__(cls, *args, **kwargs)
+        instance = cls._interned_.get(key)
+        if instance is None:
+            instance = cls._interned_.setdefault(
+                key, ABCMeta.__call__(cls, *args, **kwargs))
+        return instance
+
+    @staticmethod
+    def _intern_key_(*args, **kwargs):
+        return None
+
+
+def clear_interned():
+    """Discard the shared instances of all ``Interned`` classes.
+
+    Later constructions use the data they are given, so long running
+    processes see users, labels, and milestones which have since changed.
+    """
+    for cls in INTERNED:
+        cls._interned_.clear()
+
+
+# Lock protecting the sub-resources of all issues, it is only held while a
+# resource is looked up or added, never while a resource is fetched.
+RESOURCES_LOCK = Lock()
+
+Color = namedtuple('Color', 'red green blue')
+
+
+class Context(namedtuple('Context', ['session', 'url', 'api_url'])):
+    """Immutable context shared by a service and every object it creates.
+
+    Resolved once when the service is constructed so that issues, comments,
+    and events can make requests and construct URLs without consulting the
+    git config.
+
+    Attributes:
+        :session: Authenticated ``Session`` used for all requests.
+        :url: HTML URL of the repository, e.g. ``https://host/owner/name``.
+        :api_url: API URL of the repository.
+    """
+
+    __slots__ = ()
+
+
 class Service(with_metaclass(ABCMeta)):
     """Abstract base class for an issue service.
 
@@ -142,7 +570,9 @@ class Service(with_metaclass(ABCMeta)):
     """
 
     def __init__(self):
-        pass
+        # When disabled services must not make additional requests to
+        # resolve user details, only the username is displayed.
+        self.resolve_users = True
 
     @abstractmethod
     def create(self, title, body, **data):
@@ -181,20 +611,47 @@ class Service(with_metaclass(ABCMeta)):
         raise NotImplementedError
 
     @abstractmethod
-    def issues(self, state):
-        """Get a list of issues.
+    def issues(self, state, since=None, **filters):
+        """Get issues, most recently created first.
+
+        Arguments are validated immediately but issues are fetched lazily, page
+        by page, as the returned iterator is consumed. Stop consuming the
+        iterator to stop fetching issues. Filters are sent to the service so
+        that only matching issues are transferred, those the service can not
+        express are applied using ``filter_issues()``.
 
         Arguments:
             :state: State name for issues to get.
 
+        Keyword Arguments:
+            :since: Only get issues updated at or after this service encoded
+            date, as found in ``Issue.updated`` (optional).
+            :labels: Only get issues with all of these label names (optional).
+            :assignee: Only get issues assigned to this username (optional).
+            :author: Only get issues created by this username (optional).
+            :milestone: Only get issues in the milestone with this title
+            (optional).
+
         Returns:
-            :list: Of ``Issue`` objects.
+            :iterator: Of ``Issue`` objects.
 
         Raises:
             :GitIssueError: Containing message about the error.
         """
         raise NotImplementedError
 
+    @abstractmethod
+    def load(self, data):
+        """Create an issue from previously fetched service data.
+
+        Arguments:
+            :data: The ``Issue.data`` of an issue fetched from this service.
+
+        Returns:
+            :Issue: The loaded issue.
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def states(self):
         """Get a list of issue states.
@@ -246,8 +703,50 @@ class Service(with_metaclass(ABCMeta)):
         """
         raise NotImplementedError
 
+    def rate_limits(self):
+        """Get the request budgets of the service.
+
+        By default the repository is requested and the budget is read from
+        the response headers, services with a rate limit endpoint should
+        override this method.
+
+        Returns:
+            :dict: Mapping names of budgets to ``RateLimit`` objects, empty
+            if the service does not report a rate limit.
+
+        Raises:
+            :GitIssueError: If the request was unsuccessful.
+        """
+        response = self.session.get(self.context.api_url)
+        if response.status_code != 200:
+            raise GitIssueError(response)
+        rate_limit = self.session.rate_limit
+        return {'requests': rate_limit} if rate_limit.limit else {}
+
+    def invalidate(self):
+        """Discard data cached by the service so it is requested again.
+
+        Services which cache project data, such as labels and milestones,
+        for the lifetime of the process should override this method and call
+        the base implementation, which discards shared users, labels, and
+        milestones, see ``clear_interned()``.
+        """
+        clear_interned()
+
+    def resolve(self, users):
+        """Resolve user details before they are displayed.
+
+        Services which require additional requests to get the name or email of
+        a user should override this method and fetch the details for all
+        ``users`` in a single batch. Does nothing by default.
 
-class Issue(with_metaclass(ABCMeta)):
+        Arguments:
+            :users: Iterable of ``User`` objects, may contain ``None``.
+        """
+        pass
+
+
+class Issue(with_metaclass(ABCMeta, Dated)):
     """Generic class to represent an issue.
 
     Arguments:
@@ -264,34 +763,46 @@ class Issue(with_metaclass(ABCMeta)):
         :labels: ``list`` of ``Label``'s containing  (optional).
         :milestone: Name of the issue milestone (optional).
         :num_comments: Number of comments on the issue (optional).
+        :data: Decoded JSON the service provided for the issue, used to store
+        the issue locally (optional).
     """
 
+    __slots__ = ('number', 'title', 'body', 'state', 'author', 'updated',
+                 'assignee', 'labels', 'milestones', 'num_comments', 'data',
+                 'resources')
+
     def __init__(self, number, title, body, state, author, created, **kwargs):
-        if not isinstance(number, IssueNumber):
-            raise ValueError('number must be a subclass of IssueNumber')
         self.number = number
-        if not isinstance(title, basestring):
-            raise ValueError('title must be a string')
         self.title = title
-        if not isinstance(body, basestring):
-            raise ValueError('body must be a string')
         self.body = body
-        if not isinstance(state, IssueState):
-            raise ValueError('state must be an instance of IssueState')
         self.state = state
-        if not isinstance(author, User):
-            raise ValueError('author must be a subclass of User')
         self.author = author
-        if not isinstance(created, basestring):
-            raise ValueError('created must be a string')
-        self.created = arrow.get(created)
+        self._set_created_(created)
         self.updated = kwargs.pop('updated', None)
+        self.assignee = kwargs.pop('assignee', None)
+        self.labels = kwargs.pop('labels', [])
+        self.milestones = kwargs.pop('milestones', None)
+        self.num_comments = kwargs.pop('num_comments', 0)
+        self.data = kwargs.pop('data', None)
+        self.resources = None
+        if CONTEXT.get('debug'):
+            self._validate_()
+
+    def _validate_(self):
+        if not isinstance(self.number, IssueNumber):
+            raise ValueError('number must be a subclass of IssueNumber')
+        if not isinstance(self.title, basestring):
+            raise ValueError('title must be a string')
+        if not isinstance(self.body, basestring):
+            raise ValueError('body must be a string')
+        if not isinstance(self.state, IssueState):
+            raise ValueError('state must be an instance of IssueState')
+        if not isinstance(self.author, User):
+            raise ValueError('author must be a subclass of User')
         if self.updated and not isinstance(self.updated, basestring):
             raise ValueError('updated must be a string')
-        self.assignee = kwargs.pop('assignee', None)
         if self.assignee and not isinstance(self.assignee, User):
             raise ValueError('assignee must be a subclass of User')
-        self.labels = kwargs.pop('labels', [])
         if isinstance(self.labels, list):
             for label in self.labels:
                 if not isinstance(label, Label):
@@ -299,19 +810,56 @@ class Issue(with_metaclass(ABCMeta)):
                         'labels must be a list of subclasses of Label')
         else:
             raise ValueError('labels must be a list of subclasses of Label')
-        self.milestones = kwargs.pop('milestones', None)
         if self.milestones:
             if (not isinstance(self.milestones, list) or
                     any([not isinstance(milestone, Milestone)
                          for milestone in self.milestones])):
                 raise ValueError(
                     'milestones must be a list of subclasses of Milestone')
-        self.num_comments = kwargs.pop('num_comments', 0)
         if self.num_comments and not isinstance(self.num_comments, int):
             raise ValueError('comments must be an integer')
 
-    def __lt__(self, other):
-        return self.created < other.created
+    def _resource_(self, name, fetch):
+        """Get a sub-resource of the issue, fetching it at most once.
+
+        Concurrent calls for the same ``name`` wait for the first to complete
+        rather than fetching the resource again, a failed fetch is not
+        remembered.
+
+        Arguments:
+            :name: Name which uniquely identifies the resource.
+            :fetch: Callable returning the complete resource.
+
+        Returns:
+            The value returned by ``fetch``.
+        """
+        from concurrent.futures import Future
+        with RESOURCES_LOCK:
+            if self.resources is None:
+                self.resources = {}
+            future = self.resources.get(name)
+            owner = future is None
+            if owner:
+                future = self.resources[name] = Future()
+        if owner:
+            try:
+                future.set_result(fetch())
+            except BaseException as error:
+                with RESOURCES_LOCK:
+                    del self.resources[name]
+                future.set_exception(error)
+                raise
+        return future.result()
+
+    def _forget_(self, name):
+        """Forget a sub-resource so the next use fetches it again.
+
+        Arguments:
+            :name: Name which uniquely identifies the resource.
+        """
+        with RESOURCES_LOCK:
+            if self.resources is not None:
+                self.resources.pop(name, None)
 
     @abstractmethod
     def comment(self, body):
@@ -330,7 +878,7 @@ class Issue(with_metaclass(ABCMeta)):
         """Get list of comments.
 
         Returns:
-            :list: Of ``IssueComment`` instances.
+            :list: Of ``IssueComment`` instances, oldest first.
 
         Raises:
             :GitIssueError: Containing message about the error.
@@ -342,13 +890,36 @@ class Issue(with_metaclass(ABCMeta)):
         """Get list of events.
 
         Returns:
-            :list: Of ``IssueEvent`` instances.
+            :list: Of ``IssueEvent`` instances, oldest first.
 
         Raises:
             :GitIssueError: Containing message about the error.
         """
         raise NotImplementedError
 
+    def timeline(self, events=True):
+        """Get all comments and events ordered by creation date.
+
+        Comments and events are fetched concurrently, both are already ordered
+        so they are merged rather than sorted.
+
+        Keyword Arguments:
+            :events: Include events in the timeline, defaults to ``True``.
+
+        Returns:
+            :list: Of ``IssueComment`` and ``IssueEvent`` instances.
+
+        Raises:
+            :GitIssueError: Containing message about the error.
+        """
+        if not events:
+            return self.comments()
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(2) as executor:
+            comments = executor.submit(self.comments)
+            events = executor.submit(self.events)
+            return list(merge(comments.result(), events.result()))
+
     @abstractmethod
     def edit(self, **kwargs):
         """Edit the issue.
@@ -411,6 +982,8 @@ class IssueNumber(with_metaclass(ABCMeta)):
     used when interacting with the service API, such as ``1``.
     """
 
+    __slots__ = ()
+
     def __init__(self):
         pass
 
@@ -423,13 +996,15 @@ class IssueNumber(with_metaclass(ABCMeta)):
         raise NotImplementedError
 
 
-class IssueState(with_metaclass(ABCMeta)):
+class IssueState(with_metaclass(Interned)):
     """Generic class to represent an issue state.
 
     Subclasses must implement ``__str__`` to show the human facing issue state
     representation, such as ``State``.
     """
 
+    __slots__ = ('name', 'color')
+
     def __init__(self, name, color):
         self.name = name
         self.color = color
@@ -444,7 +1019,7 @@ class IssueState(with_metaclass(ABCMeta)):
         return self.name != state
 
 
-class IssueComment(with_metaclass(ABCMeta)):
+class IssueComment(with_metaclass(ABCMeta, Dated)):
     """Generic class to represent an issue comment.
 
     Arguments:
@@ -453,26 +1028,24 @@ class IssueComment(with_metaclass(ABCMeta)):
         :created: UTC encoded date string of comment creation.
     """
 
+    __slots__ = ('body', 'author', 'id')
+
     def __init__(self, body, author, created, comment_id):
         self.body = body
-        if not isinstance(author, User):
-            raise ValueError('author must be a subclass of User')
+        if CONTEXT.get('debug'):
+            if not isinstance(author, User):
+                raise ValueError('author must be a subclass of User')
         self.author = author
-        if not created or not isinstance(created, basestring):
-            raise ValueError('created must be a string')
-        self.created = arrow.get(created)
+        self._set_created_(created)
         self.id = comment_id
 
-    def __lt__(self, other):
-        return self.created < other.created
-
     @abstractmethod
     def url(self):
         """Get comment HTTP URL."""
         raise NotImplementedError
 
 
-class IssueEvent(with_metaclass(ABCMeta)):
+class IssueEvent(with_metaclass(ABCMeta, Dated)):
     """Generic class to represent an issue event.
 
     Arguments:
@@ -481,22 +1054,20 @@ class IssueEvent(with_metaclass(ABCMeta)):
         :created: UTC encoded date string of event creation.
     """
 
+    __slots__ = ('event', 'actor')
+
     def __init__(self, event, actor, created):
-        if not isinstance(event, basestring):
-            raise ValueError('event must be a string')
+        if CONTEXT.get('debug'):
+            if not isinstance(event, basestring):
+                raise ValueError('event must be a string')
+            if not isinstance(actor, User):
+                raise ValueError('actor must be a subclass of User')
         self.event = event
-        if not isinstance(actor, User):
-            raise ValueError('actor must be a subclass of User')
         self.actor = actor
-        if not created or not isinstance(created, basestring):
-            raise ValueError('created must be a string')
-        self.created = arrow.get(created)
-
-    def __lt__(self, other):
-        return self.created < other.created
+        self._set_created_(created)
 
 
-class User(with_metaclass(ABCMeta)):
+class User(with_metaclass(Interned)):
     """Generic class to represent a user.
 
     Arguments:
@@ -505,6 +1076,8 @@ class User(with_metaclass(ABCMeta)):
         :name: Users full name.
     """
 
+    __slots__ = ('username', 'email', 'name')
+
     def __init__(self, username, email, name):
         self.username = username
         self.email = email
@@ -566,7 +1139,7 @@ def _hex_to_color_(color):
     }[tuple(color)]
 
 
-class Label(with_metaclass(ABCMeta)):
+class Label(with_metaclass(Interned)):
     """Generic class to represent a label.
 
     Arguments:
@@ -574,25 +1147,27 @@ class Label(with_metaclass(ABCMeta)):
         :color: 6 character hexidecimal encoded color string.
     """
 
+    __slots__ = ('name', 'color')
+
     def __init__(self, name, color):
-        if not isinstance(name, basestring):
-            raise ValueError('name must be a string')
+        if CONTEXT.get('debug'):
+            if not isinstance(name, basestring):
+                raise ValueError('name must be a string')
+            if not isinstance(color, basestring) or len(color) != 6:
+                raise ValueError('color must be a 6 character string')
         self.name = name
-        if not isinstance(color, basestring) or len(color) != 6:
-            raise ValueError('color must be a 6 character string')
-        self.color = namedtuple('Color', 'red green blue')(int(
-            color[:2], 16), int(color[2:4], 16), int(color[4:], 16))
+        self.color = Color(int(color[:2], 16), int(color[2:4], 16),
+                           int(color[4:], 16))
 
     def __str__(self):
-        from sys import stdout
-        if stdout.isatty():
+        if is_tty():
             return '%({0})s{1}%(reset)s'.format(
                 _hex_to_color_(self.color), self.name)
         else:
             return self.name
 
 
-class Milestone(with_metaclass(ABCMeta)):
+class Milestone(with_metaclass(Interned)):
     """Generic class to represent a milestone.
 
     Arguments:
@@ -602,14 +1177,17 @@ class Milestone(with_metaclass(ABCMeta)):
         :state: State of the milestone.
     """
 
+    __slots__ = ('title', 'description', 'due', 'state')
+
     def __init__(self, title, description, due, state):
-        if not isinstance(title, basestring):
-            raise ValueError('title must be a string')
+        if CONTEXT.get('debug'):
+            if not isinstance(title, basestring):
+                raise ValueError('title must be a string')
+            if not isinstance(description, basestring):
+                raise ValueError('description must be a string')
+            if due and not isinstance(due, basestring):
+                raise ValueError('due must be a UTC encoded date string')
         self.title = title
-        if not isinstance(description, basestring):
-            raise ValueError('description must be a string')
         self.description = description
-        if due and not isinstance(due, basestring):
-            raise ValueError('due must be a UTC encoded date string')
         self.due = due
         self.state = state
@@ -0,0 +1,437 @@
+"""HTTP session used by all services."""
+
+from __future__ import print_function
+
+from builtins import super
+from email.utils import mktime_tz, parsedate_tz
+from hashlib import sha1
+from json import dump, load
+from math import ceil
+from os import fdopen, makedirs, remove, rename
+from os.path import exists, isdir, join
+from tempfile import mkstemp
+from queue import Empty, Queue
+from threading import Condition, Lock, Thread
+from time import sleep, time
+from warnings import warn
+
+from requests import Response
+from requests import Session as BaseSession
+from requests.structures import CaseInsensitiveDict
+
+from git_issue import get_cache_dir
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+# Request headers which identify the user, responses are cached separately for
+# each distinct combination of these.
+IDENTITY_HEADERS = ['Accept', 'Authorization', 'Private-Token']
+
+# Response headers describing the body, these must not be replaced by the
+# headers of a "304 Not Modified" response.
+ENTITY_HEADERS = set([
+    'content-encoding', 'content-length', 'content-type', 'transfer-encoding'
+])
+
+# Response headers reporting the rate limit, GitHub uses the X-RateLimit
+# prefix, GitLab does not.
+LIMIT_HEADERS = ['X-RateLimit-Limit', 'RateLimit-Limit']
+REMAINING_HEADERS = ['X-RateLimit-Remaining', 'RateLimit-Remaining']
+RESET_HEADERS = ['X-RateLimit-Reset', 'RateLimit-Reset']
+
+# Response header naming the budget a request was counted against, GitHub
+# has separate budgets for e.g. "core", "search", and "graphql" requests.
+RESOURCE_HEADER = 'X-RateLimit-Resource'
+
+# When less than this fraction of the limit remains, requests are paced so
+# that the remaining budget lasts until the limit resets.
+PACE_FRACTION = 0.1
+
+# Maximum number of times a rate limited request is sent again.
+RATE_LIMIT_RETRIES = 3
+
+# Seconds to wait beyond the reported reset, resets are reported in whole
+# seconds and the clocks of the service and the user may differ.
+RESET_MARGIN = 1
+
+# Statuses of idempotent requests which are retried, and the backoff factor,
+# retries wait 0.5, 1, 2, ... seconds.
+RETRY_STATUSES = [500, 502, 503, 504]
+RETRY_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+RETRY_BACKOFF = 0.5
+
+
+def get_retry(retries):
+    """Get the retry policy for failed idempotent requests.
+
+    Requests which could not connect are retried regardless of method, those
+    which failed while reading the response or with a ``5xx`` status are only
+    retried for idempotent methods. After the last retry the failed response
+    is returned rather than raising an exception.
+
+    Arguments:
+        :retries: Maximum number of times a request is retried.
+
+    Returns:
+        :Retry: Policy to pass to ``HTTPAdapter``.
+    """
+    from urllib3.util.retry import Retry
+    kwargs = {
+        'total': retries,
+        'backoff_factor': RETRY_BACKOFF,
+        'status_forcelist': RETRY_STATUSES,
+        'raise_on_status': False,
+    }
+    try:
+        return Retry(allowed_methods=RETRY_METHODS, **kwargs)
+    except TypeError:
+        # urllib3 before 1.26 names the argument differently.
+        return Retry(method_whitelist=RETRY_METHODS, **kwargs)
+
+
+def _int_header_(headers, names):
+    for name in names:
+        try:
+            return int(headers[name])
+        except (KeyError, ValueError):
+            pass
+
+
+def _retry_after_(response):
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0, int(value))
+    except ValueError:
+        date = parsedate_tz(value)
+        return max(0, mktime_tz(date) - time()) if date else None
+
+
+class RateLimit(object):
+    """Request budget reported by a service.
+
+    The budget is read from the response headers of every request, services
+    allow ``limit`` requests in a window which resets at ``reset`` seconds
+    since the epoch, ``None`` when the service does not report them. Each
+    request takes a token from a bucket holding the ``remaining`` budget less
+    the requests still in flight. When the bucket is empty requests wait
+    until the window resets instead of failing, when less than a tenth of the
+    limit remains requests are paced so that the budget lasts until then.
+
+    Keyword Arguments:
+        :limit: Number of requests allowed in each window.
+        :remaining: Number of requests remaining in the current window.
+        :reset: Time the current window resets in seconds since the epoch.
+    """
+
+    def __init__(self, limit=None, remaining=None, reset=None):
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.pending = 0
+        self.last = 0
+        self.warned = None
+        self.condition = Condition()
+
+    def update(self, headers):
+        """Update the budget from the headers of a response.
+
+        Arguments:
+            :headers: Response headers.
+        """
+        remaining = _int_header_(headers, REMAINING_HEADERS)
+        if remaining is None:
+            return
+        with self.condition:
+            self.limit = _int_header_(headers, LIMIT_HEADERS)
+            self.remaining = remaining
+            self.reset = _int_header_(headers, RESET_HEADERS)
+            self.condition.notify_all()
+
+    def _wait_(self, now):
+        # Seconds to wait before sending a request, 0 to send it now.
+        if self.remaining is None or self.reset is None:
+            return 0
+        reset = self.reset + RESET_MARGIN
+        if now >= reset:
+            # The window has reset, assume the full budget is available.
+            self.remaining = self.limit
+            self.reset = None
+            return 0
+        available = self.remaining - self.pending
+        if available <= 0:
+            return reset - now
+        if self.limit and available < self.limit * PACE_FRACTION:
+            return self.last + (reset - now) / available - now
+        return 0
+
+    def acquire(self):
+        """Wait until a request may be sent and take a token."""
+        with self.condition:
+            while True:
+                now = time()
+                wait = self._wait_(now)
+                if wait <= 0:
+                    break
+                if self.remaining - self.pending <= 0 and \
+                        self.warned != self.reset:
+                    # Warn once for each window, not for every request.
+                    warn('rate limit exhausted, waiting %d seconds until it '
+                         'resets' % ceil(wait))
+                    self.warned = self.reset
+                self.condition.wait(wait)
+            self.pending += 1
+            self.last = now
+
+    def release(self):
+        """Return the token of a request which has received its response."""
+        with self.condition:
+            self.pending -= 1
+            self.condition.notify_all()
+
+
+class RateLimits(object):
+    """Request budgets reported by a service, one ``RateLimit`` each.
+
+    Services which name the budget of each response in ``RESOURCE_HEADER``
+    have a budget for each resource, others have a single budget. Requests
+    for a URL path use the budget last reported for that path, paths which
+    have not been requested use the budget of the first resource reported.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.budgets = {None: RateLimit()}
+        self.paths = {}
+        self.default = None
+
+    def _budget_(self, resource):
+        # Must be called with the lock held.
+        if resource not in self.budgets:
+            self.budgets[resource] = RateLimit()
+        return self.budgets[resource]
+
+    @property
+    def primary(self):
+        """``RateLimit`` used by requests for paths not yet requested."""
+        with self.lock:
+            return self._budget_(self.default)
+
+    def get(self, url):
+        """Get the budget a request will be counted against.
+
+        Arguments:
+            :url: URL of the request.
+
+        Returns:
+            :RateLimit: Budget of the request.
+        """
+        path = urlparse(url).path
+        with self.lock:
+            return self._budget_(self.paths.get(path, self.default))
+
+    def update(self, url, headers):
+        """Update the budget of a request from the headers of its response.
+
+        Arguments:
+            :url: URL of the request.
+            :headers: Response headers.
+
+        Returns:
+            :RateLimit: Budget the response was counted against.
+        """
+        resource = headers.get(RESOURCE_HEADER)
+        with self.lock:
+            if resource is not None:
+                self.paths[urlparse(url).path] = resource
+                if self.default is None:
+                    self.default = resource
+            budget = self._budget_(resource)
+        budget.update(headers)
+        return budget
+
+
+class Session(BaseSession):
+    """HTTP session with a conditional request cache.
+
+    Responses to ``GET`` requests which include an ``ETag`` or
+    ``Last-Modified`` header are stored in the ``http`` directory of the cache
+    directory. Subsequent requests for the same URL by the same user send
+    ``If-None-Match`` or ``If-Modified-Since`` and, when the service responds
+    with ``304 Not Modified``, the stored body is returned as a ``200 OK``
+    response.
+
+    Requests share the ``RateLimit`` of their resource, see ``RateLimits``,
+    which paces them according to the budget reported by the service.
+    Requests rejected because the budget is exhausted are sent again once it
+    resets, or after the time requested by ``Retry-After``.
+
+    Requests which do not specify a timeout use ``timeout``. When ``hedge``
+    is set a ``GET`` which has not completed after ``hedge`` seconds is sent
+    again and the first successful response is used.
+
+    Arguments:
+        :cache: Enable the conditional request cache.
+        :workers: Maximum number of concurrent requests to make using this
+        session.
+
+    Keyword Arguments:
+        :timeout: Default timeout, seconds or a ``(connect, read)`` tuple.
+        :hedge: Seconds to wait before hedging a ``GET`` request.
+    """
+
+    def __init__(self, cache=True, workers=1, timeout=None, hedge=None):
+        super().__init__()
+        self.cache = cache
+        self.cache_dir = None
+        self.workers = workers
+        self.timeout = timeout
+        self.hedge = hedge
+        self.rate_limits = RateLimits()
+
+    def _cache_path_(self, request):
+        if self.cache_dir is None:
+            self.cache_dir = join(get_cache_dir(), 'http')
+            if not isdir(self.cache_dir):
+                makedirs(self.cache_dir)
+        key = sha1(request.url.encode('utf-8'))
+        for header in IDENTITY_HEADERS:
+            key.update(b'\0')
+            key.update(request.headers.get(header, '').encode('utf-8'))
+        return join(self.cache_dir, '%s.json' % key.hexdigest())
+
+    def _load_(self, path):
+        if exists(path):
+            try:
+                with open(path, 'r') as entry:
+                    return load(entry)
+            except ValueError:
+                remove(path)
+
+    def _store_(self, path, response):
+        try:
+            body = response.content.decode('utf-8')
+        except UnicodeDecodeError:
+            return
+        fd, temp = mkstemp(dir=self.cache_dir)
+        with fdopen(fd, 'w') as entry:
+            dump({
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'headers': dict(response.headers),
+                'body': body,
+            }, entry)
+        rename(temp, path)
+
+    def _cached_response_(self, request, response, entry):
+        cached = Response()
+        cached.status_code = 200
+        cached.reason = 'OK'
+        cached.url = response.url
+        cached.request = request
+        cached.connection = response.connection
+        cached.elapsed = response.elapsed
+        cached.history = response.history
+        cached.encoding = 'utf-8'
+        cached.headers = CaseInsensitiveDict(entry['headers'])
+        # Keep up to date headers, e.g. rate limits, but not the entity
+        # headers which describe the empty body of the 304 response.
+        for name, value in response.headers.items():
+            if name.lower() not in ENTITY_HEADERS:
+                cached.headers[name] = value
+        cached._content = entry['body'].encode('utf-8')
+        response.close()
+        return cached
+
+    @property
+    def rate_limit(self):
+        """``RateLimit`` of the primary budget of the service."""
+        return self.rate_limits.primary
+
+    def _rate_limited_(self, response, rate_limit):
+        # Seconds to wait before sending the request again, None when it was
+        # not rejected due to the rate limit.
+        if response.status_code not in [403, 429]:
+            return None
+        retry_after = _retry_after_(response)
+        if retry_after is not None:
+            return retry_after
+        if rate_limit.remaining == 0:
+            # RateLimit.acquire() waits until the limit resets.
+            return 0 if rate_limit.reset else RESET_MARGIN
+
+    def _hedged_(self, request, **kwargs):
+        send = super().send
+        if not self.hedge or request.method != 'GET' or kwargs.get('stream'):
+            return send(request, **kwargs)
+        results = Queue()
+
+        def _race_(request):
+            try:
+                results.put((send(request, **kwargs), None))
+            except Exception as error:
+                results.put((None, error))
+
+        def _start_(request):
+            thread = Thread(target=_race_, args=(request, ))
+            # The losing request must not delay exiting.
+            thread.daemon = True
+            thread.start()
+
+        _start_(request)
+        try:
+            response, error = results.get(timeout=self.hedge)
+        except Empty:
+            _start_(request.copy())
+            response, error = results.get()
+            if error is not None:
+                # The first to finish failed, wait for the other.
+                response, error = results.get()
+        if error is not None:
+            raise error
+        return response
+
+    def _send_(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        attempt = 0
+        while True:
+            rate_limit = self.rate_limits.get(request.url)
+            rate_limit.acquire()
+            try:
+                response = self._hedged_(request, **kwargs)
+            finally:
+                rate_limit.release()
+            wait = self._rate_limited_(
+                response, self.rate_limits.update(request.url,
+                                                  response.headers))
+            if wait is None or attempt == RATE_LIMIT_RETRIES:
+                return response
+            if wait > 0:
+                warn('rate limited, retrying in %d seconds' % wait)
+                sleep(wait)
+            response.close()
+            attempt += 1
+
+    def send(self, request, **kwargs):
+        if not self.cache or request.method != 'GET' or kwargs.get('stream'):
+            return self._send_(request, **kwargs)
+        path = self._cache_path_(request)
+        entry = self._load_(path)
+        if entry:
+            if entry['etag']:
+                request.headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request.headers['If-Modified-Since'] = entry['last_modified']
+        response = self._send_(request, **kwargs)
+        if response.status_code == 304 and entry:
+            return self._cached_response_(request, response, entry)
+        if response.status_code == 200 and (
+                'ETag' in response.headers or
+                'Last-Modified' in response.headers):
+            self._store_(path, response)
+        return response
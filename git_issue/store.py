@@ -0,0 +1,347 @@
+"""Local issue store."""
+
+from __future__ import print_function
+
+import sqlite3
+from collections import deque
+from json import dumps, loads
+from os.path import join
+
+from git_issue import GitIssueError, get_cache_dir
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS issues (
+    number TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    created TEXT NOT NULL,
+    updated TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS issues_created ON issues (created);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS commented (
+    number TEXT PRIMARY KEY
+);
+'''
+
+# The commented table holds the number of each stored issue whose comments are
+# in the search index.
+
+# Full-text index of issues, the rowid of each entry is the rowid of the issue
+# in the issues table.
+SEARCH_SCHEMA = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5 (
+    title,
+    body,
+    comments
+);
+'''
+
+# Relative weight of matches in the title, body, and comments of issues when
+# ranking search results.
+SEARCH_WEIGHTS = (10.0, 2.0, 1.0)
+
+
+def get_store_path(service):
+    """Get the path of the store of a service.
+
+    Arguments:
+        :service: ``Service`` the stored issues belong to.
+
+    Returns:
+        :str: Path of the database in the cache directory.
+    """
+    return join(get_cache_dir(), '%s.db' % type(service).__name__)
+
+
+def _state_(issue):
+    # Services name the open state differently, e.g. GitLab uses "opened".
+    return 'closed' if issue.state == 'closed' else 'open'
+
+
+class Store(object):
+    """Local SQLite store of a services issues.
+
+    The store lives in the cache directory, one database per service, and is
+    populated by ``sync()``. The first sync fetches all issues, subsequent
+    syncs only fetch issues updated since the previous sync. The title, body,
+    and comments of stored issues are indexed for ``search()`` when SQLite
+    supports FTS5.
+
+    Arguments:
+        :service: ``Service`` the stored issues belong to.
+
+    Keyword Arguments:
+        :timeout: Seconds to wait for a lock held by another connection
+        before raising ``sqlite3.OperationalError``.
+    """
+
+    def __init__(self, service, timeout=5.0):
+        self.service = service
+        self.path = get_store_path(service)
+        self.connection = sqlite3.connect(self.path, timeout=timeout)
+        self.connection.executescript(SCHEMA)
+        try:
+            self.connection.executescript(SEARCH_SCHEMA)
+            self.searchable = True
+        except sqlite3.OperationalError:
+            # SQLite was built without FTS5.
+            self.searchable = False
+        if self.searchable and self._get_meta_('indexed') is None:
+            self._index_()
+
+    def _index_(self):
+        # Index issues stored before the search index was added.
+        with self.connection:
+            for rowid, data in self.connection.execute(
+                    'SELECT rowid, data FROM issues WHERE rowid NOT IN '
+                    '(SELECT rowid FROM search)').fetchall():
+                issue = self.service.load(loads(data))
+                self.connection.execute(
+                    'INSERT INTO search (rowid, title, body, comments) '
+                    'VALUES (?, ?, ?, ?)',
+                    (rowid, issue.title, issue.body or '', ''))
+            self._set_meta_('indexed', '1')
+
+    def close(self):
+        """Close the database connection."""
+        self.connection.close()
+
+    def _get_meta_(self, key):
+        row = self.connection.execute('SELECT value FROM meta WHERE key = ?',
+                                      (key, )).fetchone()
+        return row[0] if row else None
+
+    def _set_meta_(self, key, value):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+            (key, value))
+
+    @property
+    def synced(self):
+        """Service encoded date of the most recently updated stored issue."""
+        return self._get_meta_('synced')
+
+    def sync(self, full=False, comments=False):
+        """Fetch new and updated issues from the service.
+
+        Arguments:
+            :full: Discard all stored issues and fetch everything.
+            :comments: Also fetch the comments of new and updated issues, and
+            of stored issues whose comments have not been fetched, to index
+            them for ``search()``, comments are requested concurrently for up
+            to ``session.workers`` issues at a time.
+
+        Returns:
+            :int: Number of issues which were added or updated.
+        """
+        if full:
+            with self.connection:
+                self.connection.execute('DELETE FROM issues')
+                self.connection.execute('DELETE FROM meta')
+                self.connection.execute('DELETE FROM commented')
+                if self.searchable:
+                    self.connection.execute('DELETE FROM search')
+        since = self.synced
+        latest = since
+        count = 0
+        if comments:
+            from concurrent.futures import ThreadPoolExecutor
+            workers = self.service.session.workers
+            executor = ThreadPoolExecutor(workers)
+            pending = deque()
+
+        def _comments_(issue):
+            if not issue.num_comments:
+                self.add_comments(issue, [])
+                return
+            pending.append((issue, executor.submit(issue.comments)))
+            if len(pending) > 2 * workers:
+                issue, future = pending.popleft()
+                self.add_comments(issue, future.result())
+
+        try:
+            with self.connection:
+                for issue in self.service.issues('all', since=since):
+                    self.add(issue)
+                    count += 1
+                    if issue.updated and (not latest or
+                                          issue.updated > latest):
+                        latest = issue.updated
+                    if comments:
+                        _comments_(issue)
+                while comments and pending:
+                    issue, future = pending.popleft()
+                    self.add_comments(issue, future.result())
+                if latest:
+                    self._set_meta_('synced', latest)
+            if comments and self.searchable:
+                # Issues stored by a sync without comments.
+                with self.connection:
+                    for data, in self.connection.execute(
+                            'SELECT data FROM issues WHERE number NOT IN '
+                            '(SELECT number FROM commented)').fetchall():
+                        _comments_(self.service.load(loads(data)))
+                    while pending:
+                        issue, future = pending.popleft()
+                        self.add_comments(issue, future.result())
+        finally:
+            if comments:
+                for issue, future in pending:
+                    future.cancel()
+                executor.shutdown(wait=False)
+        return count
+
+    def add(self, issue):
+        """Add or replace an issue in the store.
+
+        Arguments:
+            :issue: ``Issue`` to store.
+        """
+        number = '%r' % issue.number
+        values = (_state_(issue), issue.created_key.isoformat(),
+                  issue.updated, dumps(issue.data))
+        # The issue is updated in place so that its rowid, which identifies it
+        # in the search index, does not change.
+        row = self.connection.execute(
+            'SELECT rowid, updated FROM issues WHERE number = ?',
+            (number, )).fetchone()
+        if row:
+            rowid, updated = row
+            if updated != issue.updated:
+                # The indexed comments may no longer be current.
+                self.connection.execute(
+                    'DELETE FROM commented WHERE number = ?', (number, ))
+            self.connection.execute(
+                'UPDATE issues SET state = ?, created = ?, updated = ?, '
+                'data = ? WHERE rowid = ?', values + (rowid, ))
+        else:
+            rowid = self.connection.execute(
+                'INSERT INTO issues (state, created, updated, data, number) '
+                'VALUES (?, ?, ?, ?, ?)', values + (number, )).lastrowid
+        if self.searchable:
+            if not self.connection.execute(
+                    'UPDATE search SET title = ?, body = ? WHERE rowid = ?',
+                    (issue.title, issue.body or '', rowid)).rowcount:
+                self.connection.execute(
+                    'INSERT INTO search (rowid, title, body, comments) '
+                    'VALUES (?, ?, ?, ?)',
+                    (rowid, issue.title, issue.body or '', ''))
+
+    def add_comments(self, issue, comments):
+        """Index the comments of a stored issue for ``search()``.
+
+        Arguments:
+            :issue: ``Issue`` in the store.
+            :comments: ``list`` of all of the issues ``IssueComment``'s,
+            replacing those previously indexed.
+        """
+        if self.searchable:
+            number = '%r' % issue.number
+            self.connection.execute(
+                'UPDATE search SET comments = ? WHERE rowid = '
+                '(SELECT rowid FROM issues WHERE number = ?)',
+                ('\n\n'.join([comment.body or '' for comment in comments]),
+                 number))
+            self.connection.execute(
+                'INSERT OR REPLACE INTO commented (number) VALUES (?)',
+                (number, ))
+
+    def issue(self, number):
+        """Get a single stored issue.
+
+        Arguments:
+            :number: Number of the issue to get.
+
+        Returns:
+            :Issue: The requested issue.
+
+        Raises:
+            :GitIssueError: If the issue is not in the store.
+        """
+        row = self.connection.execute(
+            'SELECT data FROM issues WHERE number = ?',
+            ('%s' % number, )).fetchone()
+        if not row:
+            raise GitIssueError('issue not found in store: %s' % number)
+        return self.service.load(loads(row[0]))
+
+    def issues(self, state):
+        """Get stored issues, most recently created first.
+
+        Arguments:
+            :state: State name for issues to get, ``'open'``, ``'closed'``, or
+            ``'all'``, GitLab's ``'opened'`` is the same as ``'open'``.
+
+        Returns:
+            :list: Of ``Issue`` objects.
+
+        Raises:
+            :GitIssueError: If the store has never been synced.
+        """
+        if self.synced is None:
+            raise GitIssueError('no stored issues, fetch them using:\n'
+                                'git issue fetch')
+        if state == 'opened':
+            state = 'open'
+        if state == 'all':
+            rows = self.connection.execute(
+                'SELECT data FROM issues ORDER BY created DESC')
+        elif state in ['open', 'closed']:
+            rows = self.connection.execute(
+                'SELECT data FROM issues WHERE state = ? '
+                'ORDER BY created DESC', (state, ))
+        else:
+            raise GitIssueError('invalid issue state: %s' % state)
+        return [self.service.load(loads(row[0])) for row in rows]
+
+    def search(self, query, limit=None, markers=('', '')):
+        """Search the title, body, and comments of stored issues.
+
+        Issues are ranked using BM25, matches in the title rank highest and
+        matches in comments lowest, see ``SEARCH_WEIGHTS``.
+
+        Arguments:
+            :query: SQLite FTS5 query, when it is not a valid query its words
+            are searched for instead.
+
+        Keyword Arguments:
+            :limit: Maximum number of issues to get (optional).
+            :markers: Strings inserted before and after each match in the
+            snippets.
+
+        Returns:
+            :list: Of ``(issue, snippet)`` tuples, best match first, where
+            ``snippet`` is an excerpt of the best matching text.
+
+        Raises:
+            :GitIssueError: If the store has never been synced or SQLite does
+            not support FTS5.
+        """
+        if self.synced is None:
+            raise GitIssueError('no stored issues, fetch them using:\n'
+                                'git issue fetch --comments')
+        if not self.searchable:
+            raise GitIssueError('search requires SQLite with FTS5')
+        statement = (
+            'SELECT issues.data, snippet(search, -1, ?, ?, \'...\', 16) '
+            'FROM search JOIN issues ON issues.rowid = search.rowid '
+            'WHERE search MATCH ? ORDER BY bm25(search, ?, ?, ?) LIMIT ?')
+        try:
+            rows = self.connection.execute(
+                statement, markers + (query, ) + SEARCH_WEIGHTS +
+                (-1 if limit is None else limit, )).fetchall()
+        except sqlite3.OperationalError:
+            # Quote each word so that punctuation is not parsed as syntax.
+            words = ['"%s"' % word.replace('"', '""')
+                     for word in query.split()]
+            if not words:
+                raise GitIssueError('empty search query')
+            rows = self.connection.execute(
+                statement, markers + (' '.join(words), ) + SEARCH_WEIGHTS +
+                (-1 if limit is None else limit, )).fetchall()
+        return [(self.service.load(loads(data)), snippet)
+                for data, snippet in rows]
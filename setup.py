@@ -33,7 +33,8 @@ setup(
     install_requires=[
         'arrow',
         'colorama',
-        'future',
+        'future; python_version < "3"',
+        'futures; python_version < "3"',
         'git-url-parse',
         'pick',
         'requests',